@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Comparaison des instantanés binaires de TetrisGame avec pickle.
+Usage : python benchmarks/serialization.py [nombre_de_parties]"""
+
+import os
+import pickle
+import random
+import statistics
+import sys
+import timeit
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game_engine import TetrisGame
+
+
+def sample_games(count, seed=0):
+    """Parties jouées aléatoirement jusqu'à différents stades."""
+    rng = random.Random(seed)
+    random.seed(seed)
+    games = []
+    for _ in range(count):
+        game = TetrisGame(str(uuid.UUID(int=rng.getrandbits(128))))
+        for _ in range(rng.randint(0, 60)):
+            if game.game_over:
+                break
+            game.move_piece(rng.randint(-4, 4), 0, rng.randint(0, 3))
+            game.hard_drop()
+        games.append(game)
+    return games
+
+
+def per_call_us(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main(count=50):
+    games = sample_games(count)
+    rows = []
+    for name, dumps, loads in (
+        ('to_bytes', TetrisGame.to_bytes, TetrisGame.from_bytes),
+        ('pickle', pickle.dumps, pickle.loads),
+    ):
+        blobs = [dumps(game) for game in games]
+        encode = statistics.mean(per_call_us(lambda g=g: dumps(g), 500) for g in games)
+        decode = statistics.mean(per_call_us(lambda b=b: loads(b), 500) for b in blobs)
+        sizes = [len(blob) for blob in blobs]
+        rows.append((name, statistics.mean(sizes), max(sizes), encode, decode))
+
+    print(f"{'format':<10} {'taille moy.':>12} {'taille max':>11} {'encode µs':>10} {'decode µs':>10}")
+    for name, mean_size, max_size, encode, decode in rows:
+        print(f"{name:<10} {mean_size:>12.1f} {max_size:>11} {encode:>10.1f} {decode:>10.1f}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
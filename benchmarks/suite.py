@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Suite de benchmarks du moteur de jeu et des routes Flask.
+Usage : python benchmarks/suite.py [--output resultats.json] [--baseline benchmarks/baseline.json]
+                                   [--save-baseline] [--tolerance 0.3] [--quick]
+
+Sans DATABASE_URL, les routes utilisent une base PostgreSQL simulée en
+mémoire (BenchConnection) : on mesure l'application, pas le serveur SQL.
+Le code de sortie vaut 1 si une mesure régresse au-delà de la tolérance
+par rapport à la référence."""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import timeit
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from game_engine import TetrisGame, decode_inputs
+from game_store import average_size
+from placements import game_placements
+from simulation import GreedyPolicy, fixed_clock, simulate_game
+
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+
+
+def sample_games(count, seed=0, max_pieces=60):
+    """Parties jouées avec la politique gloutonne jusqu'à différents stades."""
+    rng = random.Random(seed)
+    games = []
+    for index in range(count):
+        game = TetrisGame(f'bench-{index}', rng=random.Random(seed + index), clock=fixed_clock)
+        policy = GreedyPolicy()
+        for _ in range(rng.randint(10, max_pieces)):
+            if game.game_over:
+                break
+            choice = policy.choose(game)
+            if choice is not None:
+                game.piece_rotation, game.piece_x = choice
+            game.hard_drop()
+        games.append(game)
+    return games
+
+
+def per_call_us(games, call, number, repeat=7):
+    """Temps moyen d'un appel, mesuré sur toutes les parties à chaque répétition."""
+    def run():
+        for game in games:
+            call(game)
+    return min(timeit.repeat(run, number=number, repeat=repeat)) / (number * len(games)) * 1e6
+
+
+def per_clone_us(blobs, prepare, action, repeat=7):
+    """Temps d'une action destructive, mesurée sur des copies fraîches des parties."""
+    best = None
+    for _ in range(repeat):
+        clones = [TetrisGame.from_bytes(blob) for blob in blobs]
+        for game in clones:
+            prepare(game)
+        started = time.perf_counter()
+        for game in clones:
+            action(game)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(blobs) * 1e6
+
+
+def engine_benchmarks(quick=False):
+    games = sample_games(20 if quick else 50)
+    number = 20 if quick else 100
+    blobs = [game.to_bytes() for game in games] * (4 if quick else 20)
+    results = {}
+
+    def record(name, value, unit='us'):
+        results[name] = {'value': value, 'unit': unit}
+
+    # Mémoire d'une partie en cours, rechargée comme par le serveur (PieceRandom)
+    record('bytes_per_game', average_size(TetrisGame.from_bytes(blob) for blob in blobs[:len(games)]), 'bytes')
+
+    record('is_valid_position', per_call_us(
+        games, lambda g: g.is_valid_position(g.current_piece, g.piece_x, g.piece_y + 5, g.piece_rotation),
+        number,
+    ))
+    record('place_piece', per_clone_us(blobs, lambda g: None, lambda g: g.place_piece()))
+    record('clear_lines', per_clone_us(blobs, lambda g: g.place_piece(), lambda g: g.clear_lines()))
+    record('hard_drop', per_clone_us(blobs, lambda g: None, lambda g: g.hard_drop()))
+
+    def cold_ghost(game):
+        game._ghost_cache = None
+        return game.get_ghost_position()
+
+    def cold_state(game):
+        # Ni état ni vues (plateau, statistiques) en cache
+        game.release_views()
+        return game.get_state()
+
+    record('get_ghost_position', per_call_us(games, cold_ghost, number))
+    record('get_ghost_position_cached', per_call_us(games, TetrisGame.get_ghost_position, number))
+    record('get_state', per_call_us(games, cold_state, number))
+    record('get_state_cached', per_call_us(games, TetrisGame.get_state, number))
+    record('placements', per_call_us(games, game_placements, max(1, number // 10)))
+
+    # Rejeu de parties enregistrées (entrées aléatoires, une action toutes les 50 ms)
+    recorded = []
+    for index in range(5 if quick else 20):
+        rng = random.Random(index)
+        now = datetime(2024, 1, 1)
+        game = TetrisGame(f'bench-{index}', seed=index, clock=lambda: now)
+        while not game.game_over:
+            now += timedelta(milliseconds=50)
+            game.apply_action(rng.choice(TetrisGame.ACTIONS))
+        recorded.append((game.seed, bytes(game.inputs), len(decode_inputs(game.inputs))))
+    started = time.perf_counter()
+    for seed, inputs, _ in recorded:
+        TetrisGame.replay(seed, inputs)
+    elapsed = time.perf_counter() - started
+    record('replay_actions_per_second', sum(count for _, _, count in recorded) / elapsed, 'per_second')
+
+    for policy, max_pieces in (('random', None), ('greedy', 200)):
+        seeds = range(20 if quick else 100) if policy == 'random' else range(2 if quick else 5)
+        started = time.perf_counter()
+        pieces = sum(simulate_game(seed, policy, max_pieces=max_pieces)['pieces'] for seed in seeds)
+        elapsed = time.perf_counter() - started
+        record(f'games_per_second_{policy}', len(seeds) / elapsed, 'per_second')
+        record(f'pieces_per_second_{policy}', pieces / elapsed, 'per_second')
+    return results
+
+
+class BenchCursor:
+    """Curseur minimal qui répond aux requêtes des routes mesurées."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self._result = []
+
+    def execute(self, query, params=None):
+        if 'FROM high_scores' in query and 'ORDER BY' in query:
+            limit = params[-1] if params else len(self.rows)
+            self._result = self.rows[:limit]
+        else:
+            self._result = []
+
+    def fetchall(self):
+        return list(self._result)
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+    def close(self):
+        pass
+
+
+class BenchConnection:
+    """Connexion PostgreSQL simulée, compatible avec db.ConnectionPool."""
+
+    closed = 0
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def cursor(self):
+        return BenchCursor(self.rows)
+
+    def get_transaction_status(self):
+        import psycopg2.extensions
+        return psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+def _latencies(client, count, request):
+    latencies = []
+    for index in range(count):
+        started = time.perf_counter()
+        response = request(client, index)
+        latencies.append(time.perf_counter() - started)
+        if response.status_code >= 500:
+            raise RuntimeError(f"Erreur serveur pendant le benchmark : {response.status_code}")
+    latencies.sort()
+    return latencies
+
+
+def http_benchmarks(quick=False):
+    import app as tetris_app
+    from db import ConnectionPool
+
+    if not os.environ.get('DATABASE_URL'):
+        rows = [
+            {'username': f'player{i}', 'score': 100000 - i * 137, 'lines_cleared': 50,
+             'level_reached': 5, 'time_played': 300, 'created_at': datetime(2024, 1, 1)}
+            for i in range(1000)
+        ]
+        tetris_app.db_pool = ConnectionPool('bench', connect=lambda: BenchConnection(rows))
+
+    # Des milliers d'actions par seconde d'un même joueur : on mesure les routes, pas le limiteur
+    tetris_app.action_limiter = None
+    flask_app = tetris_app.app
+    client = flask_app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 'bench-user'
+        session['username'] = 'bench'
+    client.post('/api/game/start', json={'mode': 'normal'})
+    count = 300 if quick else 2000
+    actions = ('left', 'right', 'rotate', 'down')
+
+    def move(client, index):
+        response = client.post('/api/game/move', json={'action': actions[index % len(actions)]})
+        if response.status_code == 400:
+            client.post('/api/game/start', json={'mode': 'normal'})
+        return response
+
+    def drop(client, index):
+        response = client.post('/api/game/drop')
+        if response.status_code == 400:
+            client.post('/api/game/start', json={'mode': 'normal'})
+        return response
+
+    def leaderboard(client, index):
+        return client.get('/api/leaderboard')
+
+    def leaderboard_reload(client, index):
+        tetris_app.leaderboard_cache.invalidate()
+        return client.get('/api/leaderboard')
+
+    results = {}
+    for name, request in (('move', move), ('drop', drop), ('leaderboard', leaderboard),
+                          ('leaderboard_reload', leaderboard_reload)):
+        latencies = _latencies(client, count, request)
+        total = sum(latencies)
+        results[f'http_{name}_per_second'] = {'value': count / total, 'unit': 'per_second'}
+        results[f'http_{name}_p50'] = {'value': latencies[len(latencies) // 2] * 1e6, 'unit': 'us'}
+        # Trop bruité pour faire échouer la comparaison : affiché seulement
+        results[f'http_{name}_p99'] = {
+            'value': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e6,
+            'unit': 'us',
+            'informative': True,
+        }
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Comparer aux mesures de référence ; renvoie la liste des régressions."""
+    regressions = []
+    print(f"{'mesure':<32} {'référence':>12} {'actuel':>12} {'écart':>8}")
+    for name, current in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            print(f"{name:<32} {'-':>12} {current['value']:>12.2f} {'nouveau':>8}")
+            continue
+        # Écart positif = plus lent, quelle que soit l'unité
+        if current['unit'] == 'per_second':
+            change = reference['value'] / current['value'] - 1
+        else:
+            change = current['value'] / reference['value'] - 1
+        flag = ''
+        if change > tolerance and not current.get('informative'):
+            regressions.append(name)
+            flag = '  RÉGRESSION'
+        print(f"{name:<32} {reference['value']:>12.2f} {current['value']:>12.2f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks du moteur Tetris et de l'API.")
+    parser.add_argument('--output', help="fichier JSON des résultats")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="résultats de référence")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="enregistrer les résultats comme nouvelle référence")
+    parser.add_argument('--tolerance', type=float, default=0.3,
+                        help="ralentissement toléré avant échec (0.3 = 30 %%)")
+    parser.add_argument('--quick', action='store_true', help="moins d'itérations")
+    parser.add_argument('--skip-http', action='store_true', help="ne pas mesurer les routes Flask")
+    args = parser.parse_args(argv)
+
+    results = engine_benchmarks(args.quick)
+    if not args.skip_http:
+        results.update(http_benchmarks(args.quick))
+
+    report = {
+        'meta': {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'engine': os.environ.get('TETRIS_ENGINE', 'bitboard'),
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+        print(f"Référence enregistrée dans {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(json.dumps(report, indent=2))
+        print(f"Pas de référence ({args.baseline}) : relancer avec --save-baseline")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} régression(s) au-delà de {args.tolerance:.0%} : {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+Cache LRU avec durée de vie, propre à chaque worker.
+Sert les lectures fréquentes par joueur (statistiques, rôle) sans aller en base."""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Cache LRU borné à `maxsize` entrées, chacune valable `ttl` secondes.
+
+    `get(clé, loader)` renvoie la valeur en cache ou appelle `loader()` hors
+    du verrou. Une invalidation pendant un chargement empêche de mettre en
+    cache la valeur chargée, qui peut être déjà périmée.
+    """
+
+    def __init__(self, maxsize=10000, ttl=30.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()  # clé -> (expiration, valeur)
+        self._epoch = 0  # incrémenté à chaque invalidation
+        self._lock = threading.Lock()
+        self._metrics = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get(self, key, loader):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > self.clock():
+                    self._entries.move_to_end(key)
+                    self._metrics['hits'] += 1
+                    return entry[1]
+                del self._entries[key]
+                self._metrics['expired'] += 1
+            self._metrics['misses'] += 1
+            epoch = self._epoch
+        value = loader()
+        with self._lock:
+            if epoch == self._epoch:
+                self._store(key, value)
+        return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._store(key, value)
+
+    def _store(self, key, value):
+        self._entries[key] = (self.clock() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self._metrics['evictions'] += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._epoch += 1
+            if self._entries.pop(key, None) is not None:
+                self._metrics['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._metrics)
+            stats['entries'] = len(self._entries)
+            stats['maxsize'] = self.maxsize
+            stats['ttl'] = self.ttl
+        return stats
@@ -35,6 +35,12 @@ CREATE TABLE high_scores (
     lines_cleared INTEGER NOT NULL,
     level_reached INTEGER NOT NULL,
     time_played INTEGER NOT NULL, -- in seconds
+    game_mode VARCHAR(20) NOT NULL DEFAULT 'normal',
+    seed BIGINT, -- graine du générateur de pièces
+    replay BYTEA, -- entrées du joueur : varint (délai en ms << 3 | action) par action
+    verification_status VARCHAR(10) NOT NULL DEFAULT 'pending', -- pending, verified, rejected, legacy (antérieur au rejeu, classé)
+    rejection_reason VARCHAR(50),
+    verified_at TIMESTAMP WITH TIME ZONE,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -65,6 +71,26 @@ CREATE TABLE user_stats (
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Classements par période : agrégats par joueur, mode de jeu et tranche de
+-- temps (jour, semaine, depuis toujours), alimentés par les scores classés
+-- (vérifiés, ou « legacy » : enregistrés avant le rejeu).
+-- Les classements quotidiens et hebdomadaires ne lisent que cette table.
+CREATE TABLE score_rollups (
+    period VARCHAR(5) NOT NULL, -- day, week, all
+    bucket_start DATE NOT NULL, -- jour, lundi de la semaine (UTC), 1970-01-01 pour all
+    game_mode VARCHAR(20) NOT NULL,
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    games_played INTEGER NOT NULL DEFAULT 0,
+    total_score BIGINT NOT NULL DEFAULT 0,
+    best_score INTEGER NOT NULL DEFAULT 0,
+    best_lines INTEGER NOT NULL DEFAULT 0, -- lignes et niveau de la partie du meilleur score
+    best_level INTEGER NOT NULL DEFAULT 0,
+    best_score_at TIMESTAMP WITH TIME ZONE,
+    best_sprint_time INTEGER, -- in seconds, sprints terminés (40 lignes) uniquement
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (period, bucket_start, game_mode, user_id)
+);
+
 -- Table des messages de contact
 CREATE TABLE IF NOT EXISTS messages (
     id SERIAL PRIMARY KEY,
@@ -80,35 +106,171 @@ CREATE INDEX idx_users_username ON users(username);
 CREATE INDEX idx_users_email ON users(email);
 CREATE INDEX idx_high_scores_user_id ON high_scores(user_id);
 CREATE INDEX idx_high_scores_score ON high_scores(score DESC);
+CREATE INDEX idx_high_scores_ranked_score ON high_scores(score DESC) WHERE verification_status IN ('verified', 'legacy');
+CREATE INDEX idx_high_scores_pending ON high_scores(created_at) WHERE verification_status = 'pending';
+CREATE INDEX idx_score_rollups_best ON score_rollups(period, game_mode, bucket_start, best_score DESC, best_score_at);
+CREATE INDEX idx_score_rollups_sprint ON score_rollups(period, game_mode, bucket_start, best_sprint_time)
+    WHERE best_sprint_time IS NOT NULL;
 CREATE INDEX idx_game_sessions_user_id ON game_sessions(user_id);
 CREATE INDEX idx_game_sessions_active ON game_sessions(is_active);
 
 -- Fonction de mise à jour des statistiques utilisateur
+-- Déclencheur par instruction : un lot de scores (INSERT multi-lignes, COPY)
+-- met à jour user_stats une seule fois par joueur
 CREATE OR REPLACE FUNCTION update_user_stats()
 RETURNS TRIGGER AS $$
 BEGIN
-    -- Mettre à jour les statistiques de l'utilisateur lors des nouveaux scores
     INSERT INTO user_stats (user_id, total_games_played, total_score, total_lines_cleared, total_time_played, best_score, best_level)
-    VALUES (NEW.user_id, 1, NEW.score, NEW.lines_cleared, NEW.time_played, NEW.score, NEW.level_reached)
+    SELECT user_id, COUNT(*), SUM(score), SUM(lines_cleared), SUM(time_played), MAX(score), MAX(level_reached)
+    FROM new_scores
+    GROUP BY user_id
     ON CONFLICT (user_id) DO UPDATE SET
-        total_games_played = user_stats.total_games_played + 1,
-        total_score = user_stats.total_score + NEW.score,
-        total_lines_cleared = user_stats.total_lines_cleared + NEW.lines_cleared,
-        total_time_played = user_stats.total_time_played + NEW.time_played,
-        best_score = GREATEST(user_stats.best_score, NEW.score),
-        best_level = GREATEST(user_stats.best_level, NEW.level_reached),
+        total_games_played = user_stats.total_games_played + EXCLUDED.total_games_played,
+        total_score = user_stats.total_score + EXCLUDED.total_score,
+        total_lines_cleared = user_stats.total_lines_cleared + EXCLUDED.total_lines_cleared,
+        total_time_played = user_stats.total_time_played + EXCLUDED.total_time_played,
+        best_score = GREATEST(user_stats.best_score, EXCLUDED.best_score),
+        best_level = GREATEST(user_stats.best_level, EXCLUDED.best_level),
         updated_at = CURRENT_TIMESTAMP;
     
-    RETURN NEW;
+    RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
--- Déclencher la mise à jour des statistiques après l'insertion d'un nouveau score
+-- Déclencher la mise à jour des statistiques après chaque insertion de scores
 CREATE TRIGGER trigger_update_user_stats
     AFTER INSERT ON high_scores
-    FOR EACH ROW
+    REFERENCING NEW TABLE AS new_scores
+    FOR EACH STATEMENT
     EXECUTE FUNCTION update_user_stats();
 
+-- Ajouter aux classements par période les scores classés parmi `score_ids`
+-- (une ligne par joueur, mode et tranche, quel que soit le nombre de scores)
+CREATE OR REPLACE FUNCTION rollup_scores(score_ids UUID[])
+RETURNS VOID AS $$
+    INSERT INTO score_rollups (period, bucket_start, game_mode, user_id, games_played, total_score,
+                               best_score, best_lines, best_level, best_score_at, best_sprint_time)
+    SELECT p.period, p.bucket_start, hs.game_mode, hs.user_id, COUNT(*), SUM(hs.score), MAX(hs.score),
+           (ARRAY_AGG(hs.lines_cleared ORDER BY hs.score DESC, hs.created_at))[1],
+           (ARRAY_AGG(hs.level_reached ORDER BY hs.score DESC, hs.created_at))[1],
+           (ARRAY_AGG(hs.created_at ORDER BY hs.score DESC, hs.created_at))[1],
+           MIN(hs.time_played) FILTER (WHERE hs.game_mode = 'sprint' AND hs.lines_cleared >= 40)
+    FROM high_scores hs
+    CROSS JOIN LATERAL (VALUES
+        ('day', (hs.created_at AT TIME ZONE 'UTC')::DATE),
+        ('week', DATE_TRUNC('week', hs.created_at AT TIME ZONE 'UTC')::DATE),
+        ('all', DATE '1970-01-01')
+    ) AS p(period, bucket_start)
+    WHERE hs.id = ANY(score_ids)
+      AND hs.verification_status IN ('verified', 'legacy')
+      AND hs.user_id IS NOT NULL
+    GROUP BY p.period, p.bucket_start, hs.game_mode, hs.user_id
+    ON CONFLICT (period, bucket_start, game_mode, user_id) DO UPDATE SET
+        games_played = score_rollups.games_played + EXCLUDED.games_played,
+        total_score = score_rollups.total_score + EXCLUDED.total_score,
+        best_score = GREATEST(score_rollups.best_score, EXCLUDED.best_score),
+        best_lines = CASE WHEN EXCLUDED.best_score > score_rollups.best_score
+                          THEN EXCLUDED.best_lines ELSE score_rollups.best_lines END,
+        best_level = CASE WHEN EXCLUDED.best_score > score_rollups.best_score
+                          THEN EXCLUDED.best_level ELSE score_rollups.best_level END,
+        best_score_at = CASE WHEN EXCLUDED.best_score > score_rollups.best_score
+                             THEN EXCLUDED.best_score_at ELSE score_rollups.best_score_at END,
+        best_sprint_time = LEAST(score_rollups.best_sprint_time, EXCLUDED.best_sprint_time),
+        updated_at = CURRENT_TIMESTAMP;
+$$ LANGUAGE sql;
+
+-- Scores insérés déjà classés (import)
+CREATE OR REPLACE FUNCTION rollup_inserted_scores()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM rollup_scores(ARRAY(SELECT id FROM new_scores WHERE verification_status IN ('verified', 'legacy')));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Scores qui viennent de passer à « verified » (ou « legacy », migration)
+CREATE OR REPLACE FUNCTION rollup_verified_scores()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM rollup_scores(ARRAY(
+        SELECT n.id
+        FROM new_scores n
+        JOIN old_scores o ON o.id = n.id
+        WHERE n.verification_status IN ('verified', 'legacy')
+          AND o.verification_status NOT IN ('verified', 'legacy')
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trigger_rollup_inserted_scores
+    AFTER INSERT ON high_scores
+    REFERENCING NEW TABLE AS new_scores
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION rollup_inserted_scores();
+
+CREATE TRIGGER trigger_rollup_verified_scores
+    AFTER UPDATE ON high_scores
+    REFERENCING OLD TABLE AS old_scores NEW TABLE AS new_scores
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION rollup_verified_scores();
+
+-- Compactage : supprimer les tranches quotidiennes et hebdomadaires trop
+-- anciennes (les agrégats « all » sont conservés) ; renvoie le nombre de lignes
+CREATE OR REPLACE FUNCTION compact_score_rollups(day_retention INTEGER DEFAULT 35, week_retention INTEGER DEFAULT 104)
+RETURNS INTEGER AS $$
+DECLARE
+    removed INTEGER;
+BEGIN
+    DELETE FROM score_rollups
+    WHERE (period = 'day' AND bucket_start < CURRENT_DATE - day_retention)
+       OR (period = 'week' AND bucket_start < CURRENT_DATE - week_retention * 7);
+    GET DIAGNOSTICS removed = ROW_COUNT;
+    RETURN removed;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Recalculer user_stats depuis high_scores en une seule passe (après un import
+-- en masse fait sans déclencheurs) ; renvoie le nombre de joueurs
+CREATE OR REPLACE FUNCTION rebuild_user_stats()
+RETURNS INTEGER AS $$
+DECLARE
+    players INTEGER;
+BEGIN
+    DELETE FROM user_stats;
+    INSERT INTO user_stats (user_id, total_games_played, total_score, total_lines_cleared, total_time_played, best_score, best_level)
+    SELECT user_id, COUNT(*), SUM(score), SUM(lines_cleared), SUM(time_played), MAX(score), MAX(level_reached)
+    FROM high_scores
+    WHERE user_id IS NOT NULL
+    GROUP BY user_id;
+    GET DIAGNOSTICS players = ROW_COUNT;
+    RETURN players;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Recalculer score_rollups depuis les scores classés, par lots de `batch_size`
+-- scores ; renvoie le nombre de scores agrégés
+CREATE OR REPLACE FUNCTION rebuild_score_rollups(batch_size INTEGER DEFAULT 10000)
+RETURNS INTEGER AS $$
+DECLARE
+    batch UUID[];
+    total INTEGER := 0;
+BEGIN
+    DELETE FROM score_rollups;
+    FOR batch IN
+        SELECT ARRAY_AGG(id)
+        FROM (SELECT id, (ROW_NUMBER() OVER (ORDER BY id) - 1) / batch_size AS chunk
+              FROM high_scores
+              WHERE verification_status IN ('verified', 'legacy')) AS ranked
+        GROUP BY chunk
+    LOOP
+        PERFORM rollup_scores(batch);
+        total := total + CARDINALITY(batch);
+    END LOOP;
+    RETURN total;
+END;
+$$ LANGUAGE plpgsql;
+
 -- Fonction pour mettre à jour le timestamp de la session de jeu
 CREATE OR REPLACE FUNCTION update_session_timestamp()
 RETURNS TRIGGER AS $$
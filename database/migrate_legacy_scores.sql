@@ -0,0 +1,210 @@
+-- Migration d'une base existante vers le schéma actuel d'init.sql : mode de
+-- jeu, vérification des scores par rejeu, classements par période et
+-- déclencheurs par instruction. Prévue pour une base créée par la première
+-- version d'init.sql (ou une version intermédiaire) ; rejouable sans effet
+-- sur une base déjà à jour :
+--   psql -U tetris_user -d tetris_db -f database/migrate_legacy_scores.sql
+--
+-- Les scores enregistrés avant le rejeu (ni graine ni entrées) ne peuvent pas
+-- être vérifiés : ils passent à « legacy » et restent dans les classements au
+-- lieu d'être rejetés.
+
+BEGIN;
+
+-- Colonnes de high_scores ; les lignes existantes passent en « legacy »
+ALTER TABLE high_scores ADD COLUMN IF NOT EXISTS game_mode VARCHAR(20) NOT NULL DEFAULT 'normal';
+ALTER TABLE high_scores ADD COLUMN IF NOT EXISTS seed BIGINT;
+ALTER TABLE high_scores ADD COLUMN IF NOT EXISTS replay BYTEA;
+ALTER TABLE high_scores ADD COLUMN IF NOT EXISTS verification_status VARCHAR(10) NOT NULL DEFAULT 'legacy';
+ALTER TABLE high_scores ALTER COLUMN verification_status SET DEFAULT 'pending';
+ALTER TABLE high_scores ADD COLUMN IF NOT EXISTS rejection_reason VARCHAR(50);
+ALTER TABLE high_scores ADD COLUMN IF NOT EXISTS verified_at TIMESTAMP WITH TIME ZONE;
+
+-- Classements par période
+CREATE TABLE IF NOT EXISTS score_rollups (
+    period VARCHAR(5) NOT NULL, -- day, week, all
+    bucket_start DATE NOT NULL, -- jour, lundi de la semaine (UTC), 1970-01-01 pour all
+    game_mode VARCHAR(20) NOT NULL,
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    games_played INTEGER NOT NULL DEFAULT 0,
+    total_score BIGINT NOT NULL DEFAULT 0,
+    best_score INTEGER NOT NULL DEFAULT 0,
+    best_lines INTEGER NOT NULL DEFAULT 0, -- lignes et niveau de la partie du meilleur score
+    best_level INTEGER NOT NULL DEFAULT 0,
+    best_score_at TIMESTAMP WITH TIME ZONE,
+    best_sprint_time INTEGER, -- in seconds, sprints terminés (40 lignes) uniquement
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (period, bucket_start, game_mode, user_id)
+);
+
+DROP INDEX IF EXISTS idx_high_scores_verified_score;
+CREATE INDEX IF NOT EXISTS idx_high_scores_ranked_score ON high_scores(score DESC)
+    WHERE verification_status IN ('verified', 'legacy');
+CREATE INDEX IF NOT EXISTS idx_high_scores_pending ON high_scores(created_at)
+    WHERE verification_status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_score_rollups_best
+    ON score_rollups(period, game_mode, bucket_start, best_score DESC, best_score_at);
+CREATE INDEX IF NOT EXISTS idx_score_rollups_sprint
+    ON score_rollups(period, game_mode, bucket_start, best_sprint_time)
+    WHERE best_sprint_time IS NOT NULL;
+
+-- Fonctions (mêmes définitions qu'init.sql)
+CREATE OR REPLACE FUNCTION update_user_stats()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO user_stats (user_id, total_games_played, total_score, total_lines_cleared, total_time_played, best_score, best_level)
+    SELECT user_id, COUNT(*), SUM(score), SUM(lines_cleared), SUM(time_played), MAX(score), MAX(level_reached)
+    FROM new_scores
+    GROUP BY user_id
+    ON CONFLICT (user_id) DO UPDATE SET
+        total_games_played = user_stats.total_games_played + EXCLUDED.total_games_played,
+        total_score = user_stats.total_score + EXCLUDED.total_score,
+        total_lines_cleared = user_stats.total_lines_cleared + EXCLUDED.total_lines_cleared,
+        total_time_played = user_stats.total_time_played + EXCLUDED.total_time_played,
+        best_score = GREATEST(user_stats.best_score, EXCLUDED.best_score),
+        best_level = GREATEST(user_stats.best_level, EXCLUDED.best_level),
+        updated_at = CURRENT_TIMESTAMP;
+    
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION rollup_scores(score_ids UUID[])
+RETURNS VOID AS $$
+    INSERT INTO score_rollups (period, bucket_start, game_mode, user_id, games_played, total_score,
+                               best_score, best_lines, best_level, best_score_at, best_sprint_time)
+    SELECT p.period, p.bucket_start, hs.game_mode, hs.user_id, COUNT(*), SUM(hs.score), MAX(hs.score),
+           (ARRAY_AGG(hs.lines_cleared ORDER BY hs.score DESC, hs.created_at))[1],
+           (ARRAY_AGG(hs.level_reached ORDER BY hs.score DESC, hs.created_at))[1],
+           (ARRAY_AGG(hs.created_at ORDER BY hs.score DESC, hs.created_at))[1],
+           MIN(hs.time_played) FILTER (WHERE hs.game_mode = 'sprint' AND hs.lines_cleared >= 40)
+    FROM high_scores hs
+    CROSS JOIN LATERAL (VALUES
+        ('day', (hs.created_at AT TIME ZONE 'UTC')::DATE),
+        ('week', DATE_TRUNC('week', hs.created_at AT TIME ZONE 'UTC')::DATE),
+        ('all', DATE '1970-01-01')
+    ) AS p(period, bucket_start)
+    WHERE hs.id = ANY(score_ids)
+      AND hs.verification_status IN ('verified', 'legacy')
+      AND hs.user_id IS NOT NULL
+    GROUP BY p.period, p.bucket_start, hs.game_mode, hs.user_id
+    ON CONFLICT (period, bucket_start, game_mode, user_id) DO UPDATE SET
+        games_played = score_rollups.games_played + EXCLUDED.games_played,
+        total_score = score_rollups.total_score + EXCLUDED.total_score,
+        best_score = GREATEST(score_rollups.best_score, EXCLUDED.best_score),
+        best_lines = CASE WHEN EXCLUDED.best_score > score_rollups.best_score
+                          THEN EXCLUDED.best_lines ELSE score_rollups.best_lines END,
+        best_level = CASE WHEN EXCLUDED.best_score > score_rollups.best_score
+                          THEN EXCLUDED.best_level ELSE score_rollups.best_level END,
+        best_score_at = CASE WHEN EXCLUDED.best_score > score_rollups.best_score
+                             THEN EXCLUDED.best_score_at ELSE score_rollups.best_score_at END,
+        best_sprint_time = LEAST(score_rollups.best_sprint_time, EXCLUDED.best_sprint_time),
+        updated_at = CURRENT_TIMESTAMP;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION rollup_inserted_scores()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM rollup_scores(ARRAY(SELECT id FROM new_scores WHERE verification_status IN ('verified', 'legacy')));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION rollup_verified_scores()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM rollup_scores(ARRAY(
+        SELECT n.id
+        FROM new_scores n
+        JOIN old_scores o ON o.id = n.id
+        WHERE n.verification_status IN ('verified', 'legacy')
+          AND o.verification_status NOT IN ('verified', 'legacy')
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION compact_score_rollups(day_retention INTEGER DEFAULT 35, week_retention INTEGER DEFAULT 104)
+RETURNS INTEGER AS $$
+DECLARE
+    removed INTEGER;
+BEGIN
+    DELETE FROM score_rollups
+    WHERE (period = 'day' AND bucket_start < CURRENT_DATE - day_retention)
+       OR (period = 'week' AND bucket_start < CURRENT_DATE - week_retention * 7);
+    GET DIAGNOSTICS removed = ROW_COUNT;
+    RETURN removed;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION rebuild_user_stats()
+RETURNS INTEGER AS $$
+DECLARE
+    players INTEGER;
+BEGIN
+    DELETE FROM user_stats;
+    INSERT INTO user_stats (user_id, total_games_played, total_score, total_lines_cleared, total_time_played, best_score, best_level)
+    SELECT user_id, COUNT(*), SUM(score), SUM(lines_cleared), SUM(time_played), MAX(score), MAX(level_reached)
+    FROM high_scores
+    WHERE user_id IS NOT NULL
+    GROUP BY user_id;
+    GET DIAGNOSTICS players = ROW_COUNT;
+    RETURN players;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION rebuild_score_rollups(batch_size INTEGER DEFAULT 10000)
+RETURNS INTEGER AS $$
+DECLARE
+    batch UUID[];
+    total INTEGER := 0;
+BEGIN
+    DELETE FROM score_rollups;
+    FOR batch IN
+        SELECT ARRAY_AGG(id)
+        FROM (SELECT id, (ROW_NUMBER() OVER (ORDER BY id) - 1) / batch_size AS chunk
+              FROM high_scores
+              WHERE verification_status IN ('verified', 'legacy')) AS ranked
+        GROUP BY chunk
+    LOOP
+        PERFORM rollup_scores(batch);
+        total := total + CARDINALITY(batch);
+    END LOOP;
+    RETURN total;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Déclencheurs par instruction (l'ancien trigger_update_user_stats était par ligne)
+DROP TRIGGER IF EXISTS trigger_update_user_stats ON high_scores;
+CREATE TRIGGER trigger_update_user_stats
+    AFTER INSERT ON high_scores
+    REFERENCING NEW TABLE AS new_scores
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION update_user_stats();
+
+DROP TRIGGER IF EXISTS trigger_rollup_inserted_scores ON high_scores;
+CREATE TRIGGER trigger_rollup_inserted_scores
+    AFTER INSERT ON high_scores
+    REFERENCING NEW TABLE AS new_scores
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION rollup_inserted_scores();
+
+DROP TRIGGER IF EXISTS trigger_rollup_verified_scores ON high_scores;
+CREATE TRIGGER trigger_rollup_verified_scores
+    AFTER UPDATE ON high_scores
+    REFERENCING OLD TABLE AS old_scores NEW TABLE AS new_scores
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION rollup_verified_scores();
+
+-- Bases déjà passées au rejeu : anciens scores restés « pending » ou rejetés
+-- faute de rejeu (toute partie récente enregistre sa graine)
+UPDATE high_scores
+SET verification_status = 'legacy', rejection_reason = NULL, verified_at = NULL
+WHERE seed IS NULL AND replay IS NULL
+  AND (verification_status = 'pending'
+       OR (verification_status = 'rejected' AND rejection_reason = 'no_replay'));
+
+-- Classements par période recalculés depuis tous les scores classés
+SELECT rebuild_score_rollups();
+
+COMMIT;
@@ -0,0 +1,187 @@
+"""
+Accès à la base de données PostgreSQL.
+Pool de connexions partagé par toutes les routes de l'application."""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+
+
+class PoolTimeout(Exception):
+    """Aucune connexion n'a pu être obtenue avant l'expiration du délai."""
+
+
+class ConnectionPool:
+    """Pool de connexions psycopg2 thread-safe.
+
+    Les connexions sont ouvertes à la demande jusqu'à `maxconn`, réutilisées en
+    LIFO, vérifiées par un `SELECT 1` si elles sont restées inactives plus de
+    `health_check_interval` secondes, et fermées après `max_idle` secondes
+    d'inactivité tant que le pool garde au moins `minconn` connexions.
+    """
+
+    def __init__(self, dsn, minconn=1, maxconn=10, timeout=5.0, max_idle=300.0,
+                 health_check_interval=30.0, connect=None):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Taille de pool invalide")
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.health_check_interval = health_check_interval
+        self._connect = connect or self._default_connect
+        self._idle = deque()  # (connexion, dernier retour au pool)
+        self._size = 0
+        self._cond = threading.Condition(threading.Lock())
+        self._metrics = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'timeouts': 0,
+            'connections_created': 0,
+            'connections_closed': 0,
+            'health_check_failures': 0,
+        }
+
+    def _default_connect(self):
+        return psycopg2.connect(self.dsn, cursor_factory=psycopg2.extras.RealDictCursor)
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self._metrics['connections_closed'] += 1
+
+    def _evict_idle(self, now):
+        """Fermer les connexions inactives trop anciennes (verrou tenu)."""
+        while (self._idle and self._size > self.minconn
+               and now - self._idle[0][1] > self.max_idle):
+            conn, _ = self._idle.popleft()
+            self._size -= 1
+            self._close(conn)
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self, timeout=None):
+        """Emprunter une connexion, en attendant au plus `timeout` secondes."""
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        waited = False
+        while True:
+            with self._cond:
+                started = time.monotonic()
+                while True:
+                    now = time.monotonic()
+                    self._evict_idle(now)
+                    if self._idle:
+                        conn, last_used = self._idle.pop()
+                        break
+                    if self._size < self.maxconn:
+                        self._size += 1
+                        conn, last_used = None, None
+                        break
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self._metrics['timeouts'] += 1
+                        raise PoolTimeout(
+                            f"Aucune connexion disponible après {timeout:.1f}s"
+                        )
+                    if not waited:
+                        waited = True
+                        self._metrics['waits'] += 1
+                    self._cond.wait(remaining)
+                if waited:
+                    self._metrics['wait_time'] += time.monotonic() - started
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._metrics['connections_created'] += 1
+            elif (conn.closed or time.monotonic() - last_used > self.health_check_interval) \
+                    and not self._is_healthy(conn):
+                with self._cond:
+                    self._metrics['health_check_failures'] += 1
+                    self._size -= 1
+                    self._close(conn)
+                    self._cond.notify()
+                continue
+
+            with self._cond:
+                self._metrics['checkouts'] += 1
+            return conn
+
+    def putconn(self, conn, discard=False):
+        """Rendre une connexion au pool (ou la fermer si `discard`)."""
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+        with self._cond:
+            if discard or conn.closed:
+                self._size -= 1
+                self._close(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Emprunter une connexion le temps d'un bloc `with`.
+
+        La connexion revient toujours au pool ; une transaction non validée est
+        annulée et une connexion cassée est fermée plutôt que réutilisée.
+        """
+        conn = self.getconn(timeout)
+        discard = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            discard = True
+            raise
+        finally:
+            self.putconn(conn, discard=discard)
+
+    def closeall(self):
+        """Fermer toutes les connexions inactives."""
+        with self._cond:
+            while self._idle:
+                conn, _ = self._idle.popleft()
+                self._size -= 1
+                self._close(conn)
+            self._cond.notify_all()
+
+    def stats(self):
+        """Métriques du pool (compteurs cumulés et occupation courante)."""
+        with self._cond:
+            stats = dict(self._metrics)
+            stats['size'] = self._size
+            stats['idle'] = len(self._idle)
+            stats['in_use'] = self._size - len(self._idle)
+            stats['minconn'] = self.minconn
+            stats['maxconn'] = self.maxconn
+        return stats
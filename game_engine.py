@@ -0,0 +1,1326 @@
+"""
+Moteur du jeu Tetris, indépendant de Flask.
+Contient les formes des pièces, les moteurs de plateau et la classe TetrisGame."""
+
+import os
+import random
+import uuid
+from array import array
+from datetime import datetime, timedelta
+
+# Constantes du jeu Tetris
+BOARD_WIDTH = 10
+BOARD_HEIGHT = 20
+SPAWN_X = BOARD_WIDTH // 2 - 2  # colonne d'apparition des pièces
+TETROMINO_SHAPES = {
+    'I': [
+        ['.....',
+         '..#..',
+         '..#..',
+         '..#..',
+         '..#..'],
+        ['.....',
+         '.....',
+         '####.',
+         '.....',
+         '.....']
+    ],
+    'O': [
+        ['.....',
+         '.....',
+         '.##..',
+         '.##..',
+         '.....']
+    ],
+    'T': [
+        ['.....',
+         '.....',
+         '.#...',
+         '###..',
+         '.....'],
+        ['.....',
+         '.....',
+         '.#...',
+         '.##..',
+         '.#...'],
+        ['.....',
+         '.....',
+         '.....',
+         '###..',
+         '.#...'],
+        ['.....',
+         '.....',
+         '.#...',
+         '##...',
+         '.#...']
+    ],
+    'S': [
+        ['.....',
+         '.....',
+         '.##..',
+         '##...',
+         '.....'],
+        ['.....',
+         '.....',
+         '.#...',
+         '.##..',
+         '..#..']
+    ],
+    'Z': [
+        ['.....',
+         '.....',
+         '##...',
+         '.##..',
+         '.....'],
+        ['.....',
+         '.....',
+         '..#..',
+         '.##..',
+         '.#...']
+    ],
+    'J': [
+        ['.....',
+         '.....',
+         '.#...',
+         '.#...',
+         '##...'],
+        ['.....',
+         '.....',
+         '#....',
+         '###..',
+         '.....'],
+        ['.....',
+         '.....',
+         '.##..',
+         '.#...',
+         '.#...'],
+        ['.....',
+         '.....',
+         '.....',
+         '###..',
+         '..#..']
+    ],
+    'L': [
+        ['.....',
+         '.....',
+         '.#...',
+         '.#...',
+         '.##..'],
+        ['.....',
+         '.....',
+         '.....',
+         '###..',
+         '#....'],
+        ['.....',
+         '.....',
+         '##...',
+         '.#...',
+         '.#...'],
+        ['.....',
+         '.....',
+         '..#..',
+         '###..',
+         '.....']
+    ],
+# Nouveau triomino000
+    'A': [
+        ['.....',
+         '.....',
+         '.....',
+         '#....',
+         '##...',
+         '.....'],
+        ['.....',
+         '.....',
+         '.....',
+         '##...',
+         '#....',
+         '.....'],
+        ['.....',
+         '.....',
+         '.....',
+         '.#...',
+         '##...',
+         '.....'],
+        ['.....',
+         '.....',
+         '.....',
+         '##...',
+         '.#...',
+         '.....']
+    ],
+# Nouveau triomino001
+    'B': [
+        ['.....',
+         '.....',
+         '.....',
+         '#....',
+         '.....',
+         '.....']
+    ],
+# Nouveau triomino002
+    'C': [
+        ['.....',
+         '.....',
+         '.....',
+         '#....',
+         '#....',
+         '.....'],
+        ['.....',
+         '.....',
+         '.....',
+         '##...',
+         '.....',
+         '.....']
+    ]
+}
+
+# Masque d'une ligne complète (un bit par colonne, bit 0 = colonne 0)
+FULL_ROW_MASK = (1 << BOARD_WIDTH) - 1
+_OCCUPANCY_DIGITS = b'0' + b'1' * 255
+_EMPTY_ROW = (0,) * BOARD_WIDTH
+
+# Moteur de plateau par défaut ('bitboard' ou 'grid')
+DEFAULT_ENGINE = os.environ.get('TETRIS_ENGINE', 'bitboard')
+
+
+class CompiledShape:
+    """Forme d'une pièce compilée une fois pour toutes en masques de lignes.
+
+    `cells` liste les cases occupées (dy, dx), `rows` les couples (dy, masque)
+    des lignes non vides, et `masks_by_x` les mêmes masques déjà décalés pour
+    chaque colonne x où la pièce tient dans la largeur du plateau.
+    `bottoms_by_x` donne pour chaque x l'empreinte du dessous de la pièce :
+    les couples (colonne du plateau, dy de la case la plus basse).
+    """
+
+    __slots__ = ('cells', 'rows', 'min_dx', 'max_dx', 'max_dy', 'masks_by_x', 'bottoms_by_x')
+
+    def __init__(self, shape):
+        self.cells = tuple(
+            (row_idx, col_idx)
+            for row_idx, row in enumerate(shape)
+            for col_idx, cell in enumerate(row)
+            if cell == '#'
+        )
+        row_masks = {}
+        for dy, dx in self.cells:
+            row_masks[dy] = row_masks.get(dy, 0) | (1 << dx)
+        self.rows = tuple(sorted(row_masks.items()))
+        self.min_dx = min(dx for _, dx in self.cells)
+        self.max_dx = max(dx for _, dx in self.cells)
+        self.max_dy = max(dy for dy, _ in self.cells)
+        self.masks_by_x = {}
+        for x in range(-self.min_dx, BOARD_WIDTH - self.max_dx):
+            self.masks_by_x[x] = tuple(
+                (dy, mask << x if x >= 0 else mask >> -x) for dy, mask in self.rows
+            )
+        bottoms = {}
+        for dy, dx in self.cells:
+            bottoms[dx] = max(bottoms.get(dx, dy), dy)
+        self.bottoms_by_x = {
+            x: tuple((x + dx, dy) for dx, dy in sorted(bottoms.items()))
+            for x in self.masks_by_x
+        }
+
+
+def compile_shapes(shapes):
+    """Compiler toutes les rotations de toutes les pièces en CompiledShape."""
+    return {
+        piece_type: tuple(CompiledShape(shape) for shape in rotations)
+        for piece_type, rotations in shapes.items()
+    }
+
+
+COMPILED_SHAPES = compile_shapes(TETROMINO_SHAPES)
+
+
+def board_rows(game):
+    """Masques de lignes du plateau, quel que soit le moteur de la partie."""
+    rows = getattr(game.engine, 'rows', None)
+    if rows is not None:
+        return rows
+    return [sum(1 << x for x, cell in enumerate(row) if cell) for row in game.board]
+
+
+def _fits(rows, masks, y):
+    """La pièce de masques `masks` (voir CompiledShape.masks_by_x) tient-elle à la ligne `y` ?"""
+    for dy, mask in masks:
+        board_y = y + dy
+        if board_y >= BOARD_HEIGHT or (board_y >= 0 and rows[board_y] & mask):
+            return False
+    return True
+
+
+class GridBoard:
+    """Plateau historique : une liste de lignes et un parcours des formes ASCII."""
+
+    name = 'grid'
+    __slots__ = ('cells', 'version')
+
+    def __init__(self):
+        self.cells = [[0 for _ in range(BOARD_WIDTH)] for _ in range(BOARD_HEIGHT)]
+        self.version = 0  # incrémenté à chaque modification du plateau
+
+    def fits(self, piece_type, x, y, rotation):
+        """Vérifiez si une position de pièce est valide."""
+        shapes = TETROMINO_SHAPES[piece_type]
+        shape = shapes[rotation % len(shapes)]
+
+        for row_idx, row in enumerate(shape):
+            for col_idx, cell in enumerate(row):
+                if cell == '#':
+                    new_x = x + col_idx
+                    new_y = y + row_idx
+
+                    if (new_x < 0 or new_x >= BOARD_WIDTH or
+                        new_y >= BOARD_HEIGHT or
+                        (new_y >= 0 and self.cells[new_y][new_x])):
+                        return False
+        return True
+
+    def place(self, piece_type, x, y, rotation):
+        """Poser une pièce sur le plateau."""
+        shapes = TETROMINO_SHAPES[piece_type]
+        shape = shapes[rotation % len(shapes)]
+
+        for row_idx, row in enumerate(shape):
+            for col_idx, cell in enumerate(row):
+                if cell == '#':
+                    board_x = x + col_idx
+                    board_y = y + row_idx
+                    if board_y >= 0:
+                        self.cells[board_y][board_x] = ord(piece_type)
+        self.version += 1
+
+    def clear_full_rows(self):
+        """Supprimer les lignes complètes et renvoyer leur nombre."""
+        lines_to_clear = [y for y in range(BOARD_HEIGHT) if all(self.cells[y])]
+
+        for y in lines_to_clear:
+            del self.cells[y]
+            self.cells.insert(0, [0 for _ in range(BOARD_WIDTH)])
+        if lines_to_clear:
+            self.version += 1
+
+        return len(lines_to_clear)
+
+    def is_empty(self):
+        return all(all(cell == 0 for cell in row) for row in self.cells)
+
+    def grid(self):
+        """Grille des codes ord() (les lignes du plateau elles-mêmes)."""
+        return self.cells
+
+    def load(self, cells):
+        """Remplacer le contenu du plateau par une grille de codes ord()."""
+        self.cells = [list(row) for row in cells]
+        self.version += 1
+
+
+class BitBoard:
+    """Plateau en bitboard : un masque de 16 bits par ligne pour les collisions.
+
+    Les codes ord() des pièces sont conservés pour l'affichage dans `cells`,
+    un bytearray de 200 cases (ligne par ligne), mais collisions, pose et
+    effacement de lignes ne lisent que `rows`.
+    """
+
+    name = 'bitboard'
+    __slots__ = ('rows', 'cells', 'version')
+
+    def __init__(self):
+        self.rows = array('H', bytes(2 * BOARD_HEIGHT))
+        self.cells = bytearray(BOARD_WIDTH * BOARD_HEIGHT)
+        self.version = 0  # incrémenté à chaque modification du plateau
+
+    def fits(self, piece_type, x, y, rotation):
+        """Vérifiez si une position de pièce est valide."""
+        compiled = COMPILED_SHAPES[piece_type]
+        shape = compiled[rotation % len(compiled)]
+        masks = shape.masks_by_x.get(x)
+        if masks is None or y + shape.max_dy >= BOARD_HEIGHT:
+            return False
+
+        rows = self.rows
+        for dy, mask in masks:
+            board_y = y + dy
+            if board_y >= 0 and rows[board_y] & mask:
+                return False
+        return True
+
+    def place(self, piece_type, x, y, rotation):
+        """Poser une pièce sur le plateau."""
+        compiled = COMPILED_SHAPES[piece_type]
+        shape = compiled[rotation % len(compiled)]
+        code = ord(piece_type)
+
+        for dy, mask in shape.masks_by_x[x]:
+            if y + dy >= 0:
+                self.rows[y + dy] |= mask
+        for dy, dx in shape.cells:
+            if y + dy >= 0:
+                self.cells[(y + dy) * BOARD_WIDTH + x + dx] = code
+        self.version += 1
+
+    def clear_full_rows(self):
+        """Supprimer les lignes complètes et renvoyer leur nombre."""
+        rows = self.rows
+        if FULL_ROW_MASK not in rows:
+            return 0
+        kept = [y for y in range(BOARD_HEIGHT) if rows[y] != FULL_ROW_MASK]
+        cleared = BOARD_HEIGHT - len(kept)
+        cells = self.cells
+        self.rows = array('H', [0] * cleared + [rows[y] for y in kept])
+        self.cells = bytearray(BOARD_WIDTH * cleared) + b''.join(
+            [cells[y * BOARD_WIDTH:(y + 1) * BOARD_WIDTH] for y in kept]
+        )
+        self.version += 1
+        return cleared
+
+    def is_empty(self):
+        return not any(self.rows)
+
+    def grid(self):
+        """Vue 20x10 des codes ord() : un tuple par ligne, lignes vides partagées."""
+        cells = self.cells
+        return [
+            tuple(cells[y * BOARD_WIDTH:(y + 1) * BOARD_WIDTH]) if row else _EMPTY_ROW
+            for y, row in enumerate(self.rows)
+        ]
+
+    def load(self, cells):
+        """Remplacer le contenu du plateau par une grille de codes ord()."""
+        self.cells = bytearray().join(bytes(row) for row in cells)
+        # '0'/'1' par case, colonne 0 en bit de poids faible
+        self.rows = array('H', [
+            int(self.cells[y:y + BOARD_WIDTH].translate(_OCCUPANCY_DIGITS)[::-1], 2)
+            for y in range(0, BOARD_WIDTH * BOARD_HEIGHT, BOARD_WIDTH)
+        ])
+        self.version += 1
+
+
+BOARD_ENGINES = {
+    GridBoard.name: GridBoard,
+    BitBoard.name: BitBoard,
+}
+
+# Format binaire des instantanés de partie (TetrisGame.to_bytes)
+# Version 2 : graine, état du générateur et entrées enregistrées
+# Version 3 : les entrées peuvent être stockées à part (seule leur longueur reste)
+SNAPSHOT_MAGIC = 0x54  # 'T'
+SNAPSHOT_VERSION = 3
+SUPPORTED_SNAPSHOT_VERSIONS = (1, 2, 3)
+
+# Identifiant compact (1..n) de chaque pièce, 0 = case vide / aucune pièce
+PIECE_TYPES = tuple(TETROMINO_SHAPES.keys())
+PIECE_IDS = {piece_type: index + 1 for index, piece_type in enumerate(PIECE_TYPES)}
+ENGINE_NAMES = tuple(BOARD_ENGINES.keys())
+GAME_MODES = ('normal', 'sprint')
+ACHIEVEMENT_IDS = (
+    'first_line', 'tetris_master', 'combo_king', 'speed_demon',
+    'perfectionist', 'century', 'survivor',
+)
+# TetrisGame.achievement_bits, même disposition que dans les instantanés :
+# bit i = ACHIEVEMENT_IDS[i] débloqué, bit 8 + i = ACHIEVEMENT_FLAGS[i] atteint
+ACHIEVEMENT_FLAGS = ('first_line', 'speed_demon', 'century', 'survivor')
+_UNLOCKED_BITS = {achievement_id: 1 << bit for bit, achievement_id in enumerate(ACHIEVEMENT_IDS)}
+_PROGRESS_BITS = {key: 1 << (8 + bit) for bit, key in enumerate(ACHIEVEMENT_FLAGS)}
+
+# Conversion code ord() <-> quartet (4 bits) pour le plateau
+_CELL_TO_NIBBLE = bytes(
+    0 if code == 0 else PIECE_IDS.get(chr(code), 0xFF) for code in range(256)
+)
+_NIBBLE_TO_CELL = (0,) + tuple(ord(piece_type) for piece_type in PIECE_TYPES) \
+    + (0,) * (15 - len(PIECE_TYPES))
+_HIGH_NIBBLE = bytes(nibble << 4 if nibble < 16 else 0 for nibble in range(256))
+_HIGH_TO_CELL = bytes(_NIBBLE_TO_CELL[byte >> 4] for byte in range(256))
+_LOW_TO_CELL = bytes(_NIBBLE_TO_CELL[byte & 0x0F] for byte in range(256))
+
+_FLAG_GAME_OVER = 0x01
+_FLAG_CAN_HOLD = 0x02
+_FLAG_LAST_CLEARED = 0x04
+_FLAG_SPRINT_STARTED = 0x08
+_FLAG_UUID_USER = 0x10
+_FLAG_NO_USER = 0x20
+_FLAG_SEEDED = 0x40
+_FLAG_RECORDING = 0x80
+
+_MASK64 = (1 << 64) - 1
+
+# Entrées enregistrées : un varint par action, (délai en ms << 3) | code d'action
+_INPUT_ACTION_BITS = 3
+
+
+def _write_varint(out, value):
+    """Ajouter un entier positif encodé en varint (LEB128) à `out`."""
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _write_signed(out, value):
+    _write_varint(out, (value << 1) ^ (value >> 63))
+
+
+def _read_varint(data, pos):
+    """Lire un varint à partir de `pos`, renvoie (valeur, nouvelle position)."""
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _read_varints(data, pos, count):
+    """Lire `count` varints consécutifs, renvoie (liste, nouvelle position)."""
+    values = []
+    for _ in range(count):
+        byte = data[pos]
+        if byte < 0x80:
+            values.append(byte)
+            pos += 1
+        else:
+            value, pos = _read_varint(data, pos)
+            values.append(value)
+    return values, pos
+
+
+def _read_signed(data, pos):
+    value, pos = _read_varint(data, pos)
+    return (value >> 1) ^ -(value & 1), pos
+
+
+class PieceRandom:
+    """Générateur des pièces d'une partie (splitmix64).
+
+    Tout son état tient dans un entier de 64 bits, copié dans les
+    instantanés : la suite des pièces ne dépend que de la graine.
+    """
+
+    __slots__ = ('state',)
+
+    def __init__(self, seed):
+        self.state = seed & _MASK64
+
+    def next64(self):
+        self.state = z = (self.state + 0x9E3779B97F4A7C15) & _MASK64
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+        return z ^ (z >> 31)
+
+    def choice(self, seq):
+        return seq[(self.next64() * len(seq)) >> 64]
+
+
+class _ReplayClock:
+    """Horloge d'une partie rejouée : avance selon les instants enregistrés."""
+
+    __slots__ = ('now',)
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+REPLAY_EPOCH = datetime(2000, 1, 1)
+
+
+class TetrisGame:
+    """Class pour le jeu Tetris.
+    
+    Les pièces sont tirées par un PieceRandom initialisé avec `seed` (tirée
+    au hasard si absente) et chaque action passée à apply_action est
+    enregistrée dans `inputs` avec son instant : `TetrisGame.replay` rejoue
+    la partie à l'identique. `rng` et `clock` (par défaut datetime.now)
+    permettent aux simulations d'imposer leur générateur et une horloge fixe.
+    
+    La représentation est compacte (des centaines de milliers de parties par
+    worker) : attributs en __slots__, plateau en bytearray, statistiques de
+    pièces dans un tableau indexé par PIECE_IDS et succès dans un champ de
+    bits. Les vues en dict (piece_stats, achievements_*) sont construites à
+    la demande, par get_state et les instantanés.
+    """
+    
+    __slots__ = (
+        'user_id', 'seed', 'rng', 'clock', 'inputs', '_last_tick', 'engine',
+        'score', 'level', 'lines_cleared',
+        'current_piece', 'next_piece', 'piece_x', 'piece_y', 'piece_rotation',
+        'game_over', 'start_time',
+        'combo_count', 'max_combo', 'perfect_clears', 'total_pieces', 'last_action_cleared_lines',
+        'held_piece', 'can_hold', 'piece_counts',
+        'game_mode', 'sprint_start_time', 'sprint_target_lines',
+        'achievement_bits', 'tetris_master_progress', 'combo_king_progress', 'perfectionist_progress',
+        '_ghost_cache', '_achievements_key', '_state_key', '_state_cache', '_views',
+    )
+    
+    def __init__(self, user_id=None, engine=None, rng=None, clock=None, seed=None, record=True):
+        self.user_id = user_id
+        if seed is None:
+            seed = random.getrandbits(63)
+        self.seed = seed
+        self.rng = rng or PieceRandom(seed)
+        self.clock = clock or datetime.now
+        # Entrées du joueur (voir _record_input) ; None = pas d'enregistrement
+        self.inputs = bytearray() if record else None
+        self._last_tick = 0
+        engine = engine or DEFAULT_ENGINE
+        if engine not in BOARD_ENGINES:
+            raise ValueError(f"Moteur de plateau inconnu: {engine}")
+        self.engine = BOARD_ENGINES[engine]()
+        self.score = 0
+        self.level = 1
+        self.lines_cleared = 0
+        self.current_piece = self.generate_piece()
+        self.next_piece = self.generate_piece()
+        self.piece_x = SPAWN_X
+        self.piece_y = 0
+        self.piece_rotation = 0
+        self.game_over = False
+        self.start_time = self.clock()
+        
+        # Système de combo et statistiques avancées
+        self.combo_count = 0
+        self.max_combo = 0
+        self.perfect_clears = 0
+        self.total_pieces = 0
+        self.last_action_cleared_lines = False
+        
+        # Système Hold/Reserve
+        self.held_piece = None
+        self.can_hold = True
+        
+        # Statistiques de pièces (indice = PIECE_IDS, 0 inutilisé)
+        self.piece_counts = array('I', bytes(4 * (len(PIECE_TYPES) + 1)))
+        
+        # Mode de jeu (normal, sprint)
+        self.game_mode = 'normal'
+        self.sprint_start_time = None
+        self.sprint_target_lines = 40
+        
+        # Système d'achievements (voir ACHIEVEMENT_FLAGS pour les bits)
+        self.achievement_bits = 0
+        self.tetris_master_progress = 0  # Compteur de Tetris (4 lignes)
+        self.combo_king_progress = 0  # Max combo atteint
+        self.perfectionist_progress = 0  # Perfect clears
+        
+        # Caches de get_state, invalidés par leurs clés (voir get_state)
+        self._ghost_cache = None  # (clé, y de départ, ghost_y)
+        self._achievements_key = None
+        self._state_key = None
+        self._state_cache = None
+        self._views = None  # (version du plateau, plateau, piece_stats)
+        
+    def generate_piece(self):
+        """Générer un morceau de tétromino aléatoire."""
+        return self.rng.choice(PIECE_TYPES)
+    
+    def get_piece_shape(self, piece_type, rotation=0):
+        """Obtenez la matrice de forme d'une pièce à une rotation donnée."""
+        shapes = TETROMINO_SHAPES[piece_type]
+        return shapes[rotation % len(shapes)]
+    
+    @property
+    def board(self):
+        """Grille 20x10 des codes ord() des pièces posées (0 = vide)."""
+        return self.engine.grid()
+    
+    @property
+    def piece_stats(self):
+        """Nombre de pièces posées par type (dict construit à chaque appel)."""
+        return dict(zip(PIECE_TYPES, self.piece_counts[1:]))
+    
+    @property
+    def achievements_unlocked(self):
+        return [achievement_id for achievement_id, bit in _UNLOCKED_BITS.items()
+                if self.achievement_bits & bit]
+    
+    @property
+    def achievements_progress(self):
+        bits = self.achievement_bits
+        return {
+            'first_line': bool(bits & _PROGRESS_BITS['first_line']),
+            'tetris_master': self.tetris_master_progress,
+            'combo_king': self.combo_king_progress,
+            'speed_demon': bool(bits & _PROGRESS_BITS['speed_demon']),
+            'perfectionist': self.perfectionist_progress,
+            'century': bool(bits & _PROGRESS_BITS['century']),
+            'survivor': bool(bits & _PROGRESS_BITS['survivor']),
+        }
+    
+    def is_valid_position(self, piece_type, x, y, rotation):
+        """Vérifiez si une position de pièce est valide."""
+        return self.engine.fits(piece_type, x, y, rotation)
+    
+    def place_piece(self):
+        """Placez la pièce actuelle sur le plateau."""
+        self.engine.place(self.current_piece, self.piece_x, self.piece_y, self.piece_rotation)
+    
+    def clear_lines(self):
+        """Effacez les lignes complétées."""
+        lines_cleared = self.engine.clear_full_rows()
+        
+        if lines_cleared > 0:
+            self.lines_cleared += lines_cleared
+            self.last_action_cleared_lines = True
+            
+            # Système de combo
+            self.combo_count += 1
+            self.max_combo = max(self.max_combo, self.combo_count)
+            
+            # Vérifier perfect clear (toute la grille est vide)
+            if self.engine.is_empty():
+                self.perfect_clears += 1
+                perfect_clear_bonus = 3000 * self.level
+            else:
+                perfect_clear_bonus = 0
+            
+            # Scoring system amélioré avec combo
+            score_multiplier = [0, 100, 300, 500, 800]
+            base_score = score_multiplier[min(lines_cleared, 4)] * self.level
+            
+            # Bonus de combo (50 points par niveau de combo)
+            combo_bonus = 50 * self.combo_count * self.level
+            
+            self.score += base_score + combo_bonus + perfect_clear_bonus
+            self.level = min(10, 1 + self.lines_cleared // 10)
+        else:
+            # Réinitialiser le combo si aucune ligne n'est détruite
+            if self.last_action_cleared_lines:
+                self.combo_count = 0
+            self.last_action_cleared_lines = False
+        
+        return lines_cleared
+    
+    def move_piece(self, dx, dy, rotation_change=0):
+        """Déplacer ou faire pivoter la pièce actuelle."""
+        new_x = self.piece_x + dx
+        new_y = self.piece_y + dy
+        new_rotation = self.piece_rotation + rotation_change
+        
+        if self.is_valid_position(self.current_piece, new_x, new_y, new_rotation):
+            self.piece_x = new_x
+            self.piece_y = new_y
+            self.piece_rotation = new_rotation
+            return True
+        return False
+    
+    def drop_piece(self):
+        """Déposez la pièce actuelle d'une rangée vers le bas."""
+        if self.move_piece(0, 1):
+            return True
+        else:
+            # La pièce ne peut pas descendre, placez-la et récupérez la pièce suivante
+            self.place_piece()
+            lines_cleared = self.clear_lines()
+            
+            # Track Tetris achievements
+            if lines_cleared == 4:
+                self.tetris_master_progress += 1
+            
+            # Track piece statistics
+            self.piece_counts[PIECE_IDS[self.current_piece]] += 1
+            self.total_pieces += 1
+            
+            # Générer la pièce suivante
+            self.current_piece = self.next_piece
+            self.next_piece = self.generate_piece()
+            self.piece_x = SPAWN_X
+            self.piece_y = 0
+            self.piece_rotation = 0
+            
+            # Reset hold ability for new piece
+            self.can_hold = True
+            
+            # Start sprint timer on first piece
+            if self.game_mode == 'sprint' and self.sprint_start_time is None and self.total_pieces == 1:
+                self.sprint_start_time = self.clock()
+            
+            # Check game over
+            if not self.is_valid_position(self.current_piece, self.piece_x, self.piece_y, self.piece_rotation):
+                self.game_over = True
+                
+            return False
+    
+    def hard_drop(self):
+        """Drop piece all the way down."""
+        drop_distance = 0
+        while self.drop_piece():
+            drop_distance += 1
+        
+        # Bonus pour hard drop (2 points par ligne)
+        if drop_distance > 0:
+            self.score += drop_distance * 2
+        
+        return drop_distance
+    
+    def get_ghost_position(self):
+        """Calculate where the current piece will land."""
+        # Tant que le plateau, la colonne et la rotation ne changent pas, la pièce
+        # qui descend reste sur le même chemin : le point d'arrivée est inchangé
+        key = (self.engine.version, self.current_piece, self.piece_x, self.piece_rotation)
+        cached = self._ghost_cache
+        if cached is not None and cached[0] == key and cached[1] <= self.piece_y <= cached[2]:
+            return cached[2]
+        
+        ghost_y = self.piece_y
+        while self.is_valid_position(self.current_piece, self.piece_x, ghost_y + 1, self.piece_rotation):
+            ghost_y += 1
+        self._ghost_cache = (key, self.piece_y, ghost_y)
+        return ghost_y
+    
+    def hold_piece(self):
+        """Hold/swap the current piece."""
+        if not self.can_hold:
+            return False
+        
+        if self.held_piece is None:
+            # First hold - store current piece and get next
+            self.held_piece = self.current_piece
+            self.current_piece = self.next_piece
+            self.next_piece = self.generate_piece()
+        else:
+            # Swap current with held
+            self.held_piece, self.current_piece = self.current_piece, self.held_piece
+        
+        # Reset position and rotation
+        self.piece_x = SPAWN_X
+        self.piece_y = 0
+        self.piece_rotation = 0
+        
+        # Can't hold again until next piece
+        self.can_hold = False
+        
+        # Check if position is valid (game over if not)
+        if not self.is_valid_position(self.current_piece, self.piece_x, self.piece_y, self.piece_rotation):
+            self.game_over = True
+            return False
+        
+        return True
+    
+    # Actions du joueur acceptées par apply_action (l'indice sert de code d'action)
+    ACTIONS = ('left', 'right', 'down', 'rotate', 'hard_drop', 'hold')
+    
+    def _record_input(self, action):
+        """Ajouter l'action à `inputs` : délai depuis la précédente (ms) et code."""
+        tick = int((self.clock() - self.start_time).total_seconds() * 1000)
+        delta = max(0, tick - self._last_tick)
+        self._last_tick += delta
+        _write_varint(self.inputs, delta << _INPUT_ACTION_BITS | self.ACTIONS.index(action))
+    
+    def apply_action(self, action):
+        """Appliquer une action du joueur ; renvoie le résultat de la méthode appelée."""
+        if self.inputs is not None and action in self.ACTIONS:
+            self._record_input(action)
+        if action == 'left':
+            return self.move_piece(-1, 0)
+        if action == 'right':
+            return self.move_piece(1, 0)
+        if action == 'down':
+            return self.drop_piece()
+        if action == 'rotate':
+            return self.move_piece(0, 0, 1)
+        if action == 'hard_drop':
+            return self.hard_drop()
+        if action == 'hold':
+            return self.hold_piece()
+        raise ValueError(f"Action inconnue: {action}")
+    
+    def apply_actions(self, actions):
+        """Appliquer une suite d'actions en une passe ; renvoie le résultat de chacune.
+        
+        Chaque action est un nom ou un dict `{'action': nom, 't': horodatage}` ;
+        l'horodatage du client est renvoyé tel quel dans le résultat.
+        """
+        results = []
+        for entry in actions:
+            if isinstance(entry, dict):
+                action = entry.get('action')
+                result = {'action': action}
+                if 't' in entry:
+                    result['t'] = entry['t']
+            else:
+                action = entry
+                result = {'action': action}
+            
+            if self.game_over or action not in self.ACTIONS:
+                result['ok'] = False
+                result['rejected'] = 'game_over' if self.game_over else 'unknown_action'
+                results.append(result)
+                continue
+            
+            lines_before = self.lines_cleared
+            pieces_before = self.total_pieces
+            outcome = self.apply_action(action)
+            # Une chute aboutit toujours (la pièce descend ou se pose)
+            result['ok'] = action in ('down', 'hard_drop') or bool(outcome)
+            result['lines_cleared'] = self.lines_cleared - lines_before
+            result['locked'] = self.total_pieces != pieces_before
+            results.append(result)
+        return results
+    
+    @classmethod
+    def replay(cls, seed, inputs, game_mode='normal', engine=None, user_id=None):
+        """Rejouer une partie à partir de sa graine et de ses entrées enregistrées.
+        
+        L'horloge suit les instants enregistrés au lieu de l'heure réelle :
+        une partie de plusieurs minutes est rejouée en quelques millisecondes.
+        """
+        clock = _ReplayClock(REPLAY_EPOCH)
+        game = cls(user_id, engine=engine, clock=clock, seed=seed, record=False)
+        game.game_mode = game_mode
+        for tick, action in decode_inputs(inputs):
+            if game.game_over:
+                break
+            clock.now = REPLAY_EPOCH + timedelta(milliseconds=tick)
+            game.apply_action(action)
+        return game
+    
+    def gravity_interval(self):
+        """Délai (secondes) entre deux chutes automatiques au niveau actuel."""
+        return max(0.1, 1.0 - (self.level - 1) * 0.1)
+    
+    def check_achievements(self):
+        """Check and unlock achievements."""
+        new_achievements = []
+        
+        # First Line
+        if not self.achievement_bits & _PROGRESS_BITS['first_line'] and self.lines_cleared >= 1:
+            self.achievement_bits |= _PROGRESS_BITS['first_line']
+            new_achievements.append({
+                'id': 'first_line',
+                'name': 'Première Ligne',
+                'description': 'Complétez votre première ligne'
+            })
+        
+        # Tetris Master (5 Tetris)
+        if self.tetris_master_progress >= 5 and not self.achievement_bits & _UNLOCKED_BITS['tetris_master']:
+            new_achievements.append({
+                'id': 'tetris_master',
+                'name': 'Maître du Tetris',
+                'description': 'Réalisez 5 Tetris (4 lignes)'
+            })
+            self.achievement_bits |= _UNLOCKED_BITS['tetris_master']
+        
+        # Combo King (combo de 5+)
+        if self.max_combo >= 5 and self.combo_king_progress < 5:
+            self.combo_king_progress = self.max_combo
+            new_achievements.append({
+                'id': 'combo_king',
+                'name': 'Roi du Combo',
+                'description': 'Atteignez un combo de 5'
+            })
+        
+        # Perfectionist (1 perfect clear)
+        if self.perfect_clears >= 1 and self.perfectionist_progress == 0:
+            self.perfectionist_progress = self.perfect_clears
+            new_achievements.append({
+                'id': 'perfectionist',
+                'name': 'Perfectionniste',
+                'description': 'Réalisez un Perfect Clear'
+            })
+        
+        # Century (100 lines)
+        if not self.achievement_bits & _PROGRESS_BITS['century'] and self.lines_cleared >= 100:
+            self.achievement_bits |= _PROGRESS_BITS['century']
+            new_achievements.append({
+                'id': 'century',
+                'name': 'Centenaire',
+                'description': 'Complétez 100 lignes'
+            })
+        
+        # Survivor (reach level 10)
+        if not self.achievement_bits & _PROGRESS_BITS['survivor'] and self.level >= 10:
+            self.achievement_bits |= _PROGRESS_BITS['survivor']
+            new_achievements.append({
+                'id': 'survivor',
+                'name': 'Survivant',
+                'description': 'Atteignez le niveau 10'
+            })
+        
+        # Speed Demon (Sprint < 2 minutes)
+        if self.game_mode == 'sprint' and self.lines_cleared >= self.sprint_target_lines:
+            if self.sprint_start_time:
+                elapsed = (self.clock() - self.sprint_start_time).total_seconds()
+                if elapsed < 120 and not self.achievement_bits & _PROGRESS_BITS['speed_demon']:
+                    self.achievement_bits |= _PROGRESS_BITS['speed_demon']
+                    new_achievements.append({
+                        'id': 'speed_demon',
+                        'name': 'Démon de Vitesse',
+                        'description': 'Terminez le Sprint en moins de 2 minutes'
+                    })
+        
+        return new_achievements
+    
+    def _new_achievements(self):
+        """Succès débloqués depuis le dernier appel.
+        
+        Les règles ne dépendent que des compteurs ci-dessous : tant qu'ils ne
+        changent pas, aucune règle ne peut se déclencher.
+        """
+        key = (self.lines_cleared, self.level, self.max_combo, self.perfect_clears,
+               self.tetris_master_progress, self.game_mode)
+        if key == self._achievements_key:
+            return []
+        self._achievements_key = key
+        return self.check_achievements()
+    
+    def get_state(self):
+        """Get current game state.
+        
+        L'état est reconstruit seulement si le plateau, les pièces ou les
+        compteurs ont changé depuis l'appel précédent ; sinon le dictionnaire
+        précédent est renvoyé (sans les succès, déjà signalés).
+        """
+        key = (self.engine.version, self.current_piece, self.piece_x, self.piece_y,
+               self.piece_rotation, self.next_piece, self.held_piece, self.can_hold,
+               self.score, self.level, self.lines_cleared, self.combo_count,
+               self.max_combo, self.perfect_clears, self.total_pieces, self.game_over,
+               self.game_mode, self.sprint_target_lines)
+        if key == self._state_key:
+            state = self._state_cache
+            if state['achievements'] or 'sprint_time' in state:
+                state = dict(state, achievements=[])
+                if 'sprint_time' in state:
+                    state['sprint_time'] = (self.clock() - self.sprint_start_time).total_seconds()
+                self._state_cache = state
+            return state
+        
+        # Plateau et statistiques ne changent que lorsqu'une pièce est posée
+        views = self._views
+        if views is None or views[0] != self.engine.version:
+            views = self._views = (self.engine.version, self.board, self.piece_stats)
+        state = {
+            'board': views[1],
+            'current_piece': {
+                'type': self.current_piece,
+                'x': self.piece_x,
+                'y': self.piece_y,
+                'rotation': self.piece_rotation,
+                'shape': self.get_piece_shape(self.current_piece, self.piece_rotation)
+            },
+            'next_piece': {
+                'type': self.next_piece,
+                'shape': self.get_piece_shape(self.next_piece, 0)
+            },
+            'held_piece': {
+                'type': self.held_piece,
+                'shape': self.get_piece_shape(self.held_piece, 0) if self.held_piece else None
+            } if self.held_piece else None,
+            'can_hold': self.can_hold,
+            'ghost_y': self.get_ghost_position(),
+            'score': self.score,
+            'level': self.level,
+            'lines_cleared': self.lines_cleared,
+            'combo_count': self.combo_count,
+            'max_combo': self.max_combo,
+            'perfect_clears': self.perfect_clears,
+            'game_over': self.game_over,
+            'piece_stats': views[2],
+            'game_mode': self.game_mode,
+            'achievements': self._new_achievements()
+        }
+        
+        # Add sprint-specific data
+        if self.game_mode == 'sprint':
+            if self.sprint_start_time:
+                elapsed = (self.clock() - self.sprint_start_time).total_seconds()
+                state['sprint_time'] = elapsed
+            state['sprint_target'] = self.sprint_target_lines
+            state['sprint_complete'] = self.lines_cleared >= self.sprint_target_lines
+        
+        self._state_key = key
+        self._state_cache = state
+        return state
+    
+    def release_views(self):
+        """Oublier l'état et les vues mis en cache par get_state : une partie
+        gardée en mémoire entre deux requêtes reste compacte."""
+        self._state_key = None
+        self._state_cache = None
+        self._views = None
+    
+    # Attributs simples recopiés tels quels dans un instantané
+    SNAPSHOT_FIELDS = (
+        'user_id', 'score', 'level', 'lines_cleared',
+        'current_piece', 'next_piece', 'piece_x', 'piece_y', 'piece_rotation',
+        'game_over', 'combo_count', 'max_combo', 'perfect_clears', 'total_pieces',
+        'last_action_cleared_lines', 'held_piece', 'can_hold',
+        'game_mode', 'sprint_target_lines',
+    )
+    
+    def to_dict(self, inputs=True):
+        """Instantané sérialisable (JSON) de l'état complet de la partie.
+
+        Avec `inputs=False`, le journal des entrées n'est pas recopié (seule sa
+        longueur l'est) : il est alors à fournir à `from_dict`.
+        """
+        data = {field: getattr(self, field) for field in self.SNAPSHOT_FIELDS}
+        data['engine'] = self.engine.name
+        data['board'] = [list(row) for row in self.board]
+        data['start_time'] = self.start_time.timestamp()
+        data['sprint_start_time'] = (
+            self.sprint_start_time.timestamp() if self.sprint_start_time else None
+        )
+        data['piece_stats'] = self.piece_stats
+        data['achievements_unlocked'] = self.achievements_unlocked
+        data['achievements_progress'] = self.achievements_progress
+        data['seed'] = self.seed
+        data['rng_state'] = self.rng.state if isinstance(self.rng, PieceRandom) else None
+        if inputs or self.inputs is None:
+            data['inputs'] = self.inputs.hex() if self.inputs is not None else None
+        else:
+            data['inputs_length'] = len(self.inputs)
+        data['last_tick'] = self._last_tick
+        return data
+    
+    @classmethod
+    def from_dict(cls, data, inputs=None):
+        """Reconstruire une partie à partir d'un instantané de `to_dict`.
+
+        `inputs` : journal des entrées stocké à part, requis si l'instantané
+        a été produit avec `to_dict(inputs=False)`.
+        """
+        game = cls(data['user_id'], engine=data['engine'])
+        for field in cls.SNAPSHOT_FIELDS:
+            setattr(game, field, data[field])
+        game.engine.load(data['board'])
+        game.start_time = datetime.fromtimestamp(data['start_time'])
+        game.sprint_start_time = (
+            datetime.fromtimestamp(data['sprint_start_time'])
+            if data['sprint_start_time'] is not None else None
+        )
+        piece_stats = data['piece_stats']
+        game.piece_counts = array('I', [0] + [piece_stats.get(piece_type, 0) for piece_type in PIECE_TYPES])
+        progress = data['achievements_progress']
+        bits = 0
+        for achievement_id in data['achievements_unlocked']:
+            bits |= _UNLOCKED_BITS[achievement_id]
+        for key, bit in _PROGRESS_BITS.items():
+            if progress[key]:
+                bits |= bit
+        game.achievement_bits = bits
+        game.tetris_master_progress = progress['tetris_master']
+        game.combo_king_progress = progress['combo_king']
+        game.perfectionist_progress = progress['perfectionist']
+        if data.get('seed') is not None:
+            game.seed = data['seed']
+        if data.get('rng_state') is not None:
+            game.rng = PieceRandom(data['rng_state'])
+        if 'inputs_length' in data:
+            game.inputs = _external_inputs(inputs, data['inputs_length'])
+        else:
+            recorded = data.get('inputs')
+            game.inputs = bytearray.fromhex(recorded) if recorded is not None else None
+        game._last_tick = data.get('last_tick', 0)
+        return game
+    
+    def to_bytes(self, inputs=True):
+        """Instantané binaire compact de la partie (format versionné).
+
+        Les quatre bits de chaque case du plateau contiennent l'identifiant de
+        la pièce ; les lignes vides du haut ne sont pas écrites. Les compteurs
+        sont des varints et les dates des millisecondes depuis l'epoch. Avec
+        `inputs=False`, le journal des entrées (qui grandit à chaque coup) est
+        omis et doit être stocké à part puis fourni à `from_bytes`.
+        """
+        out = bytearray((SNAPSHOT_MAGIC, SNAPSHOT_VERSION))
+        
+        flags = 0
+        if self.game_over:
+            flags |= _FLAG_GAME_OVER
+        if self.can_hold:
+            flags |= _FLAG_CAN_HOLD
+        if self.last_action_cleared_lines:
+            flags |= _FLAG_LAST_CLEARED
+        if self.sprint_start_time is not None:
+            flags |= _FLAG_SPRINT_STARTED
+        if isinstance(self.rng, PieceRandom):
+            flags |= _FLAG_SEEDED
+        if self.inputs is not None:
+            flags |= _FLAG_RECORDING
+        user_bytes = b''
+        if self.user_id is None:
+            flags |= _FLAG_NO_USER
+        else:
+            try:
+                user_bytes = uuid.UUID(self.user_id).bytes
+                flags |= _FLAG_UUID_USER
+            except ValueError:
+                user_bytes = str(self.user_id).encode('utf-8')
+        out.append(flags)
+        out.append(ENGINE_NAMES.index(self.engine.name) << 4 | GAME_MODES.index(self.game_mode))
+        out.append(PIECE_IDS[self.current_piece] << 4 | PIECE_IDS[self.next_piece])
+        out.append(PIECE_IDS[self.held_piece] if self.held_piece else 0)
+        
+        if not flags & (_FLAG_UUID_USER | _FLAG_NO_USER):
+            _write_varint(out, len(user_bytes))
+        out += user_bytes
+        
+        _write_signed(out, self.piece_x)
+        _write_signed(out, self.piece_y)
+        _write_varint(out, self.piece_rotation)
+        for value in (self.score, self.level, self.lines_cleared, self.combo_count,
+                      self.max_combo, self.perfect_clears, self.total_pieces,
+                      self.sprint_target_lines):
+            _write_varint(out, value)
+        for count in self.piece_counts[1:]:
+            _write_varint(out, count)
+        
+        # Succès : champ de bits puis compteurs
+        for value in (self.achievement_bits, self.tetris_master_progress,
+                      self.combo_king_progress, self.perfectionist_progress):
+            _write_varint(out, value)
+        
+        _write_varint(out, int(self.start_time.timestamp() * 1000))
+        if self.sprint_start_time is not None:
+            _write_varint(out, int(self.sprint_start_time.timestamp() * 1000))
+        
+        # Graine et générateur, puis entrées enregistrées
+        _write_varint(out, self.seed)
+        if flags & _FLAG_SEEDED:
+            _write_varint(out, self.rng.state)
+        if flags & _FLAG_RECORDING:
+            _write_varint(out, self._last_tick)
+            _write_varint(out, len(self.inputs))
+            if inputs:
+                _write_varint(out, len(self.inputs))
+                out += self.inputs
+            else:
+                _write_varint(out, 0)
+        
+        # Plateau : nombre de lignes vides en haut, puis 5 octets par ligne
+        board = self.board
+        top = 0
+        while top < BOARD_HEIGHT and not any(board[top]):
+            top += 1
+        out.append(top)
+        if top < BOARD_HEIGHT:
+            nibbles = bytes([cell for row in board[top:] for cell in row]).translate(_CELL_TO_NIBBLE)
+            if 0xFF in nibbles:
+                raise ValueError("Case de plateau inconnue")
+            # Deux cases par octet : OU bit à bit des quartets hauts et bas
+            size = len(nibbles) // 2
+            packed = (int.from_bytes(nibbles[0::2].translate(_HIGH_NIBBLE), 'big')
+                      | int.from_bytes(nibbles[1::2], 'big'))
+            out += packed.to_bytes(size, 'big')
+        return bytes(out)
+    
+    @classmethod
+    def from_bytes(cls, data, inputs=None):
+        """Reconstruire une partie à partir d'un instantané de `to_bytes`.
+
+        `inputs` : journal des entrées stocké à part, requis si l'instantané
+        a été produit avec `to_bytes(inputs=False)`.
+        """
+        if len(data) < 6 or data[0] != SNAPSHOT_MAGIC:
+            raise ValueError("Instantané de partie invalide")
+        version = data[1]
+        if version not in SUPPORTED_SNAPSHOT_VERSIONS:
+            raise ValueError(f"Version d'instantané non supportée: {version}")
+        flags = data[2]
+        engine = ENGINE_NAMES[data[3] >> 4]
+        game_mode = GAME_MODES[data[3] & 0x0F]
+        current_piece = PIECE_TYPES[(data[4] >> 4) - 1]
+        next_piece = PIECE_TYPES[(data[4] & 0x0F) - 1]
+        held_piece = PIECE_TYPES[data[5] - 1] if data[5] else None
+        pos = 6
+        
+        if flags & _FLAG_NO_USER:
+            user_id = None
+        elif flags & _FLAG_UUID_USER:
+            user_id = str(uuid.UUID(bytes=bytes(data[pos:pos + 16])))
+            pos += 16
+        else:
+            length, pos = _read_varint(data, pos)
+            user_id = bytes(data[pos:pos + length]).decode('utf-8')
+            pos += length
+        
+        game = cls(user_id, engine=engine)
+        game.game_mode = game_mode
+        game.current_piece = current_piece
+        game.next_piece = next_piece
+        game.held_piece = held_piece
+        game.game_over = bool(flags & _FLAG_GAME_OVER)
+        game.can_hold = bool(flags & _FLAG_CAN_HOLD)
+        game.last_action_cleared_lines = bool(flags & _FLAG_LAST_CLEARED)
+        
+        game.piece_x, pos = _read_signed(data, pos)
+        game.piece_y, pos = _read_signed(data, pos)
+        game.piece_rotation, pos = _read_varint(data, pos)
+        # Compteurs, statistiques de pièces et succès se suivent
+        values, pos = _read_varints(data, pos, 8 + len(PIECE_TYPES) + 4)
+        (game.score, game.level, game.lines_cleared, game.combo_count,
+         game.max_combo, game.perfect_clears, game.total_pieces,
+         game.sprint_target_lines) = values[:8]
+        game.piece_counts = array('I', [0] + values[8:8 + len(PIECE_TYPES)])
+        (game.achievement_bits, game.tetris_master_progress,
+         game.combo_king_progress, game.perfectionist_progress) = values[-4:]
+        
+        start_ms, pos = _read_varint(data, pos)
+        game.start_time = datetime.fromtimestamp(start_ms / 1000)
+        if flags & _FLAG_SPRINT_STARTED:
+            sprint_ms, pos = _read_varint(data, pos)
+            game.sprint_start_time = datetime.fromtimestamp(sprint_ms / 1000)
+        
+        if version >= 2:
+            game.seed, pos = _read_varint(data, pos)
+            if flags & _FLAG_SEEDED:
+                state, pos = _read_varint(data, pos)
+                game.rng = PieceRandom(state)
+            if flags & _FLAG_RECORDING:
+                game._last_tick, pos = _read_varint(data, pos)
+                length, pos = _read_varint(data, pos)
+                stored = length
+                if version >= 3:
+                    stored, pos = _read_varint(data, pos)
+                if stored == length:
+                    game.inputs = bytearray(data[pos:pos + length])
+                else:
+                    game.inputs = _external_inputs(inputs, length)
+                pos += stored
+            else:
+                game.inputs = None
+        else:
+            # Avant la version 2 : pièces non reproductibles, pas d'entrées
+            game.inputs = None
+        
+        top = data[pos]
+        pos += 1
+        packed = bytes(data[pos:pos + (BOARD_HEIGHT - top) * BOARD_WIDTH // 2])
+        flat = bytearray(len(packed) * 2)
+        flat[0::2] = packed.translate(_HIGH_TO_CELL)
+        flat[1::2] = packed.translate(_LOW_TO_CELL)
+        cells = [[0] * BOARD_WIDTH for _ in range(top)]
+        cells += [flat[y:y + BOARD_WIDTH] for y in range(0, len(flat), BOARD_WIDTH)]
+        game.engine.load(cells)
+        return game
+
+
+def _external_inputs(inputs, length):
+    """Journal des entrées stocké hors de l'instantané, tronqué à la longueur
+    enregistrée (des entrées plus récentes ont pu être ajoutées depuis)."""
+    if inputs is None or len(inputs) < length:
+        raise ValueError("Journal des entrées manquant ou incomplet")
+    return bytearray(inputs[:length])
+
+
+def decode_inputs(data):
+    """Entrées enregistrées par TetrisGame : liste de (instant en ms, action)."""
+    entries = []
+    tick = 0
+    pos = 0
+    actions = TetrisGame.ACTIONS
+    mask = (1 << _INPUT_ACTION_BITS) - 1
+    while pos < len(data):
+        value, pos = _read_varint(data, pos)
+        tick += value >> _INPUT_ACTION_BITS
+        entries.append((tick, actions[value & mask]))
+    return entries
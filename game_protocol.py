@@ -0,0 +1,116 @@
+"""
+Protocole d'échange de l'état de jeu avec le client.
+Envoi différentiel : seuls les champs et lignes du plateau modifiés circulent."""
+
+import threading
+
+_MISSING = object()
+
+
+class StateDeltaEncoder:
+    """Suit le dernier état envoyé à un client et calcule les différences.
+
+    Chaque réponse porte un numéro de séquence `seq`. Le client renvoie le
+    dernier `seq` qu'il a appliqué : s'il correspond au dernier état envoyé,
+    la réponse ne contient que les champs modifiés (`changes`), les clés
+    modifiées des sous-objets (`merge`), les champs disparus (`removed`) et
+    les lignes du plateau modifiées (`rows`) ; sinon (client perdu, autre
+    worker, nouvelle partie) l'état complet est renvoyé.
+    """
+
+    def __init__(self):
+        self.seq = 0
+        self._last = None  # dernier état envoyé (valeurs copiées)
+        self._last_board = None  # lignes du plateau en tuples
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _snapshot(state):
+        # get_state renvoie certains objets internes (piece_stats) : les copier
+        return {
+            key: dict(value) if isinstance(value, dict) else value
+            for key, value in state.items() if key != 'board'
+        }
+
+    def reset(self):
+        with self._lock:
+            self._last = None
+            self._last_board = None
+
+    def encode(self, state, client_seq=None):
+        """Renvoyer le patch à envoyer pour amener le client à `state`."""
+        with self._lock:
+            board = [tuple(row) for row in state['board']]
+            previous = self._last
+            base = self.seq
+            self.seq += 1
+
+            if previous is None or client_seq != base:
+                patch = {'seq': self.seq, 'full': True, 'state': state}
+            else:
+                changes = {}
+                merge = {}
+                for key, value in state.items():
+                    if key == 'board' or previous.get(key, _MISSING) == value:
+                        continue
+                    old = previous.get(key)
+                    if isinstance(value, dict) and isinstance(old, dict) and old.keys() == value.keys():
+                        # Sous-objet (pièce courante...) : seulement les clés modifiées
+                        merge[key] = {k: v for k, v in value.items() if old[k] != v}
+                    else:
+                        changes[key] = value
+                removed = [key for key in previous if key not in state]
+                rows = {
+                    y: list(row) for y, row in enumerate(board)
+                    if row != self._last_board[y]
+                }
+                patch = {'seq': self.seq, 'base': base, 'changes': changes}
+                if merge:
+                    patch['merge'] = merge
+                if removed:
+                    patch['removed'] = removed
+                if rows:
+                    patch['rows'] = rows
+
+            self._last = self._snapshot(state)
+            self._last_board = board
+            return patch
+
+
+class GameChannel:
+    """Canal de diffusion d'une partie vers un flux SSE du même worker.
+
+    Les entrées du joueur publient le nouvel état avec `publish` ; le flux
+    attend avec `wait` soit une publication, soit l'heure de la prochaine
+    chute automatique.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.state = None
+        self.paused = False
+        self.closed = False
+        self._cond = threading.Condition()
+
+    def publish(self, state):
+        with self._cond:
+            self.state = state
+            self.version += 1
+            self._cond.notify_all()
+
+    def set_paused(self, paused):
+        with self._cond:
+            self.paused = paused
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def wait(self, version, timeout):
+        """Attendre une publication plus récente que `version` (ou un changement d'état)."""
+        with self._cond:
+            if self.version == version and not self.closed:
+                self._cond.wait(timeout)
+            return self.version
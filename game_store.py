@@ -0,0 +1,506 @@
+"""
+Stockage des parties en cours.
+Permet de partager les parties entre plusieurs workers gunicorn, et retire
+les parties abandonnées (inactives trop longtemps ou au-delà d'un plafond)."""
+
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from game_engine import TetrisGame
+from serving import native, offload_methods, thread_local
+
+
+class StaleGameError(Exception):
+    """La partie a été modifiée par un autre worker depuis sa lecture."""
+
+
+def dumps_game(game):
+    """Sérialiser une partie pour un stockage partagé, sans le journal des
+    entrées (stocké à part, en ajout seul)."""
+    return game.to_bytes(inputs=False)
+
+
+def loads_game(data, inputs=None):
+    """Reconstruire une partie sérialisée par `dumps_game` et son journal des entrées."""
+    return TetrisGame.from_bytes(data, inputs=inputs)
+
+
+def deep_sizeof(obj, seen=None):
+    """Taille approximative en mémoire de `obj` et de ce qu'il contient
+    (les fonctions, classes et modules partagés ne sont pas comptés)."""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen or callable(obj):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif not isinstance(obj, (str, bytes, bytearray, int, float)):
+        if hasattr(obj, '__dict__'):
+            size += deep_sizeof(vars(obj), seen)
+        for cls in type(obj).__mro__:
+            for name in getattr(cls, '__slots__', ()):
+                if hasattr(obj, name):
+                    size += deep_sizeof(getattr(obj, name), seen)
+    return size
+
+
+def average_size(games):
+    games = list(games)
+    return sum(deep_sizeof(game) for game in games) // len(games) if games else 0
+
+
+class MemoryGameStore:
+    """Parties gardées dans la mémoire du worker (un seul worker possible).
+
+    Les parties sont rangées de la moins récemment utilisée à la plus
+    récente. Au-delà de `max_games`, `create` retire les plus anciennes et
+    les passe à `on_evict(liste de (user_id, partie, dernier accès))`.
+    Comme pour SQLiteGameStore, `put` refuse une partie qui n'est plus celle
+    du stockage (terminée ou retirée pendant la requête).
+    """
+
+    name = 'memory'
+    shared = False
+
+    def __init__(self, max_games=None, on_evict=None, clock=time.time):
+        self.max_games = max_games
+        self.on_evict = on_evict
+        self.clock = clock
+        self._games = OrderedDict()  # user_id -> [partie, dernier accès]
+        self._lock = threading.Lock()
+        self.evictions = {'idle': 0, 'overflow': 0}
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._games.get(user_id)
+            if entry is None:
+                return None
+            entry[1] = self.clock()
+            self._games.move_to_end(user_id)
+            return entry[0]
+
+    def put(self, user_id, game):
+        """Enregistrer une partie lue par `get` ; StaleGameError si elle a été
+        terminée, retirée ou remplacée entre-temps (pas de partie fantôme)."""
+        with self._lock:
+            entry = self._games.get(user_id)
+            if entry is None or entry[0] is not game:
+                raise StaleGameError(user_id)
+            entry[1] = self.clock()
+            self._games.move_to_end(user_id)
+
+    def create(self, user_id, game):
+        with self._lock:
+            self._games[user_id] = [game, self.clock()]
+            self._games.move_to_end(user_id)
+        evicted = self.evict_overflow()
+        if evicted and self.on_evict:
+            self.on_evict(evicted)
+
+    def delete(self, user_id):
+        with self._lock:
+            self._games.pop(user_id, None)
+
+    def changed(self, user_id):
+        """Toujours faux : un seul processus, qui voit ses propres écritures."""
+        return False
+
+    def evict_idle(self, max_idle):
+        """Retirer les parties inutilisées depuis `max_idle` secondes."""
+        cutoff = self.clock() - max_idle
+        evicted = []
+        with self._lock:
+            while self._games:
+                user_id, (game, accessed) = next(iter(self._games.items()))
+                if accessed >= cutoff:
+                    break
+                del self._games[user_id]
+                evicted.append((user_id, game, accessed))
+            self.evictions['idle'] += len(evicted)
+        return evicted
+
+    def release_idle(self, max_idle):
+        """Libérer les vues mises en cache des parties inutilisées depuis
+        `max_idle` secondes ; renvoie leur nombre."""
+        cutoff = self.clock() - max_idle
+        released = 0
+        with self._lock:
+            for game, accessed in self._games.values():
+                if accessed >= cutoff:
+                    break
+                game.release_views()
+                released += 1
+        return released
+
+    def evict_overflow(self):
+        """Retirer les parties les moins récemment utilisées au-delà de `max_games`."""
+        evicted = []
+        with self._lock:
+            while self.max_games and len(self._games) > self.max_games:
+                user_id, (game, accessed) = self._games.popitem(last=False)
+                evicted.append((user_id, game, accessed))
+            self.evictions['overflow'] += len(evicted)
+        return evicted
+
+    def bytes_per_game(self, sample=20):
+        """Taille moyenne en mémoire des `sample` parties les plus récentes."""
+        with self._lock:
+            games = [entry[0] for _, entry in zip(range(sample), reversed(self._games.values()))]
+        return average_size(games)
+
+    def __contains__(self, user_id):
+        return user_id in self._games
+
+    def __len__(self):
+        return len(self._games)
+
+
+class SQLiteGameStore:
+    """Parties partagées entre processus via un fichier SQLite.
+
+    Chaque worker garde en cache la dernière version de chaque partie qu'il a
+    lue ou écrite : `get` ne relit l'état que si un autre worker a incrémenté
+    la version entre-temps. `put` n'écrit que si la version n'a pas bougé
+    depuis la lecture, sinon il lève StaleGameError au lieu d'écraser la
+    partie (pas de mise à jour perdue).
+
+    L'instantané ne contient pas le journal des entrées, qui grandit à chaque
+    coup : seules les entrées ajoutées depuis la dernière écriture sont
+    insérées dans `game_inputs`, dans la même transaction que l'instantané.
+
+    Sous gevent, les appels sqlite3 (bloquants, jusqu'à `timeout` secondes
+    d'attente du verrou) passent par le pool de threads du hub : une écriture
+    en attente ne fige pas les autres greenlets du worker.
+    """
+
+    name = 'sqlite'
+    shared = True
+
+    def __init__(self, path, dumps=dumps_game, loads=loads_game, timeout=5.0, max_games=None, on_evict=None):
+        self.path = path
+        self.dumps = dumps
+        self.loads = loads
+        self.timeout = timeout
+        self.max_games = max_games
+        self.on_evict = on_evict
+        self.evictions = {'idle': 0, 'overflow': 0}  # retirées par ce worker
+        # Une connexion par thread système : sous gevent, pas une par requête
+        self._local = thread_local()
+        self._cache = {}  # user_id -> (version, partie, octets d'entrées déjà stockés)
+        # Pris depuis les threads du pool sous gevent : verrou système
+        self._cache_lock = native('_thread', 'allocate_lock')()
+        conn = self._conn()
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS games (
+                   user_id TEXT PRIMARY KEY,
+                   version INTEGER NOT NULL,
+                   state BLOB NOT NULL,
+                   updated_at REAL NOT NULL
+               )"""
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS games_updated_at ON games (updated_at)")
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS game_inputs (
+                   user_id TEXT NOT NULL,
+                   position INTEGER NOT NULL,
+                   chunk BLOB NOT NULL,
+                   PRIMARY KEY (user_id, position)
+               )"""
+        )
+        conn.commit()
+        offload_methods(self, ('get', 'put', 'create', 'delete', 'changed', 'evict_idle', 'evict_overflow',
+                               'release_idle', '_count', '_contains'))
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, user_id):
+        row = self._conn().execute(
+            "SELECT version FROM games WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        if row is None:
+            with self._cache_lock:
+                self._cache.pop(user_id, None)
+            return None
+        version = row[0]
+        with self._cache_lock:
+            cached = self._cache.get(user_id)
+        if cached and cached[0] == version:
+            return cached[1]
+
+        conn = self._conn()
+        with conn:
+            # Instantané et journal lus dans la même transaction de lecture
+            conn.execute("BEGIN")
+            row = conn.execute(
+                "SELECT version, state FROM games WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            inputs = self._read_inputs(conn, user_id) if row is not None else None
+        if row is None:
+            return None
+        game = self.loads(row[1], inputs)
+        with self._cache_lock:
+            self._cache[user_id] = (row[0], game, _inputs_length(game))
+        return game
+
+    def changed(self, user_id):
+        """Vrai si un autre worker a modifié (ou retiré) la partie depuis la
+        dernière lecture ou écriture de ce worker : une seule lecture de version."""
+        row = self._conn().execute(
+            "SELECT version FROM games WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        with self._cache_lock:
+            cached = self._cache.get(user_id)
+        return row is None or cached is None or cached[0] != row[0]
+
+    def _read_inputs(self, conn, user_id):
+        return b''.join(chunk for chunk, in conn.execute(
+            "SELECT chunk FROM game_inputs WHERE user_id = ? ORDER BY position", (user_id,)
+        ))
+
+    def _append_inputs(self, conn, user_id, game, start=0):
+        """Insérer les entrées enregistrées depuis `start` ; renvoie la longueur stockée."""
+        length = _inputs_length(game)
+        if length > start:
+            conn.execute(
+                "INSERT INTO game_inputs (user_id, position, chunk) VALUES (?, ?, ?)",
+                (user_id, start, bytes(game.inputs[start:])),
+            )
+        return length
+
+    def put(self, user_id, game):
+        with self._cache_lock:
+            cached = self._cache.get(user_id)
+        if cached is None or cached[1] is not game:
+            raise StaleGameError(user_id)
+        version, _, stored = cached
+        conn = self._conn()
+        with conn:
+            cur = conn.execute(
+                """UPDATE games SET state = ?, version = version + 1, updated_at = ?
+                   WHERE user_id = ? AND version = ?""",
+                (self.dumps(game), time.time(), user_id, version),
+            )
+            if cur.rowcount == 1:
+                stored = self._append_inputs(conn, user_id, game, stored)
+        with self._cache_lock:
+            if cur.rowcount == 1:
+                self._cache[user_id] = (version + 1, game, stored)
+            else:
+                # La copie locale a divergé : la relire au prochain accès
+                self._cache.pop(user_id, None)
+        if cur.rowcount != 1:
+            raise StaleGameError(user_id)
+
+    def create(self, user_id, game):
+        """Enregistrer une nouvelle partie, en remplaçant l'éventuelle précédente."""
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                """INSERT INTO games (user_id, version, state, updated_at)
+                   VALUES (?, 1, ?, ?)
+                   ON CONFLICT (user_id) DO UPDATE SET
+                       version = games.version + 1,
+                       state = excluded.state,
+                       updated_at = excluded.updated_at""",
+                (user_id, self.dumps(game), time.time()),
+            )
+            version = conn.execute(
+                "SELECT version FROM games WHERE user_id = ?", (user_id,)
+            ).fetchone()[0]
+            conn.execute("DELETE FROM game_inputs WHERE user_id = ?", (user_id,))
+            stored = self._append_inputs(conn, user_id, game)
+        with self._cache_lock:
+            self._cache[user_id] = (version, game, stored)
+
+    def delete(self, user_id):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM games WHERE user_id = ?", (user_id,))
+            conn.execute("DELETE FROM game_inputs WHERE user_id = ?", (user_id,))
+        with self._cache_lock:
+            self._cache.pop(user_id, None)
+
+    def _evict_rows(self, rows):
+        """Supprimer les parties lues si personne ne les a modifiées entre-temps."""
+        conn = self._conn()
+        evicted = []
+        for user_id, version, state, updated_at in rows:
+            with conn:
+                cur = conn.execute("DELETE FROM games WHERE user_id = ? AND version = ?", (user_id, version))
+                # Un autre worker a pu la retirer ou la jouer entre-temps
+                if cur.rowcount == 1:
+                    inputs = self._read_inputs(conn, user_id)
+                    conn.execute("DELETE FROM game_inputs WHERE user_id = ?", (user_id,))
+            if cur.rowcount == 1:
+                evicted.append((user_id, self.loads(state, inputs), updated_at))
+            with self._cache_lock:
+                self._cache.pop(user_id, None)
+        return evicted
+
+    def evict_idle(self, max_idle):
+        """Retirer les parties non modifiées depuis `max_idle` secondes.
+
+        Le dernier accès est la dernière écriture : toute action jouée en est une.
+        """
+        rows = self._conn().execute(
+            "SELECT user_id, version, state, updated_at FROM games WHERE updated_at < ?",
+            (time.time() - max_idle,)
+        ).fetchall()
+        evicted = self._evict_rows(rows)
+        self.evictions['idle'] += len(evicted)
+        self._prune_cache()
+        return evicted
+
+    def release_idle(self, max_idle):
+        """Libérer les vues mises en cache des parties de ce worker non
+        modifiées depuis `max_idle` secondes ; renvoie leur nombre."""
+        idle = [row[0] for row in self._conn().execute(
+            "SELECT user_id FROM games WHERE updated_at < ?", (time.time() - max_idle,)
+        )]
+        released = 0
+        with self._cache_lock:
+            for user_id in idle:
+                cached = self._cache.get(user_id)
+                if cached is not None:
+                    cached[1].release_views()
+                    released += 1
+        return released
+
+    def evict_overflow(self):
+        """Retirer les parties les moins récemment modifiées au-delà de `max_games`.
+
+        Vérifié par le balayeur plutôt qu'à chaque création (COUNT(*) sur la table).
+        """
+        if not self.max_games:
+            return []
+        excess = self._count() - self.max_games
+        if excess <= 0:
+            return []
+        rows = self._conn().execute(
+            "SELECT user_id, version, state, updated_at FROM games ORDER BY updated_at LIMIT ?", (excess,)
+        ).fetchall()
+        evicted = self._evict_rows(rows)
+        self.evictions['overflow'] += len(evicted)
+        return evicted
+
+    def _prune_cache(self):
+        """Oublier les copies locales des parties terminées ou retirées par d'autres workers."""
+        live = {row[0] for row in self._conn().execute("SELECT user_id FROM games")}
+        with self._cache_lock:
+            for user_id in [user_id for user_id in self._cache if user_id not in live]:
+                del self._cache[user_id]
+
+    def bytes_per_game(self, sample=20):
+        """Taille moyenne en mémoire des parties gardées en cache par ce worker."""
+        with self._cache_lock:
+            games = [cached[1] for _, cached in zip(range(sample), self._cache.values())]
+        return average_size(games)
+
+    def _contains(self, user_id):
+        return self._conn().execute(
+            "SELECT 1 FROM games WHERE user_id = ?", (user_id,)
+        ).fetchone() is not None
+
+    def _count(self):
+        return self._conn().execute("SELECT COUNT(*) FROM games").fetchone()[0]
+
+    def __contains__(self, user_id):
+        return self._contains(user_id)
+
+    def __len__(self):
+        return self._count()
+
+
+def _inputs_length(game):
+    return len(game.inputs) if game.inputs is not None else 0
+
+
+def create_game_store(backend='memory', path=None, max_games=None, on_evict=None):
+    """Construire le stockage de parties configuré."""
+    if backend == MemoryGameStore.name:
+        return MemoryGameStore(max_games=max_games, on_evict=on_evict)
+    if backend == SQLiteGameStore.name:
+        return SQLiteGameStore(path or 'tetris_games.db', max_games=max_games, on_evict=on_evict)
+    raise ValueError(f"Stockage de parties inconnu: {backend}")
+
+
+class GameSweeper:
+    """Thread qui retire toutes les `interval` secondes les parties inactives
+    depuis `max_idle` secondes et celles au-delà du plafond du stockage, puis
+    les passe ensemble à `on_evict(liste de (user_id, partie, dernier accès))`.
+
+    Les parties sans action depuis `release_after` secondes gardent leur place
+    mais perdent les vues mises en cache par get_state (recalculées au
+    prochain coup) : ce cache sert d'une requête à l'autre pendant la partie.
+    Les fonctions de `tasks` (autres tâches de maintenance) sont appelées à
+    chaque passage.
+    """
+
+    def __init__(self, store, max_idle=1800.0, interval=60.0, on_evict=None, release_after=120.0, tasks=()):
+        self.store = store
+        self.max_idle = max_idle
+        self.interval = interval
+        self.on_evict = on_evict
+        self.release_after = release_after
+        self.tasks = list(tasks)
+        self._stopping = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._metrics = {'runs': 0, 'errors': 0, 'released': 0}
+
+    def start(self):
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name='game-sweeper', daemon=True)
+            self._thread.start()
+
+    def run_once(self):
+        try:
+            idle = self.store.evict_idle(self.max_idle) if self.max_idle else []
+            overflow = self.store.evict_overflow()
+            if (idle or overflow) and self.on_evict:
+                self.on_evict(idle + overflow)
+            released = self.store.release_idle(self.release_after) if self.release_after else 0
+        except Exception:
+            with self._lock:
+                self._metrics['errors'] += 1
+            return []
+        with self._lock:
+            self._metrics['runs'] += 1
+            self._metrics['released'] += released
+        for task in self.tasks:
+            try:
+                task()
+            except Exception:
+                with self._lock:
+                    self._metrics['errors'] += 1
+        return idle + overflow
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            self.run_once()
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._metrics)
+        stats.update({f'evicted_{reason}': count for reason, count in self.store.evictions.items()})
+        return stats
@@ -0,0 +1,42 @@
+"""
+Configuration de gunicorn pour la production : gunicorn app:app
+Workers gevent : chaque requête et chaque flux SSE est une greenlet, et les
+attentes réseau et PostgreSQL rendent la main à la boucle (voir serving.py)
+au lieu d'occuper un thread. Rechargement sans coupure : kill -HUP <maître>."""
+
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gevent')
+# Un worker par cœur : la concurrence vient des greenlets, pas des processus.
+# Avec GAME_STORE=memory, chaque partie n'existe que dans le worker qui l'a
+# créée : un seul worker, sinon « No active game » dès qu'une requête change de worker
+requested_workers = int(os.environ.get('WEB_CONCURRENCY') or multiprocessing.cpu_count())
+memory_games = os.environ.get('GAME_STORE', 'memory') == 'memory'
+workers = 1 if memory_games else requested_workers
+# Connexions simultanées par worker gevent (threads par worker pour gthread)
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 2000))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+# Délai laissé à un worker arrêté pour finir ses requêtes et vider le tampon des scores
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+# Recycler les workers régulièrement, pas tous en même temps
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+
+# Pas de préchargement : les threads d'arrière-plan (écriture des scores,
+# vérification, compactage) doivent être démarrés dans chaque worker, après le fork
+preload_app = False
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
+forwarded_allow_ips = os.environ.get('FORWARDED_ALLOW_IPS', '127.0.0.1')
+
+
+def on_starting(server):
+    if memory_games and requested_workers > 1:
+        server.log.warning(
+            "GAME_STORE=memory : un seul worker au lieu de %d (parties gardées dans le worker), "
+            "utilisez GAME_STORE=sqlite pour en lancer plusieurs", requested_workers,
+        )
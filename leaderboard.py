@@ -0,0 +1,344 @@
+"""
+Classements du jeu Tetris.
+Cache en mémoire du top des scores et classement complet par rang, mis à jour
+par les scores vérifiés, et compactage des classements par période."""
+
+import bisect
+import hashlib
+import json
+import threading
+import time
+from datetime import date, timedelta
+
+# Tranche unique des classements « depuis toujours » (table score_rollups)
+ROLLUP_ALL_TIME = date(1970, 1, 1)
+
+
+def period_start(period, day):
+    """Début de la tranche `period` contenant `day` (semaines du lundi, comme date_trunc)."""
+    if period == 'day':
+        return day
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'all':
+        return ROLLUP_ALL_TIME
+    raise ValueError(f"Période inconnue: {period}")
+
+
+class LeaderboardCache:
+    """Cache du top N des scores avec TTL, mis à jour en écriture directe.
+
+    Le contenu est chargé depuis la base par `loader` au premier accès puis
+    toutes les `ttl` secondes (pour voir les scores enregistrés par d'autres
+    workers). Entre deux chargements, `offer` insère un nouveau score s'il
+    entre dans le top. La réponse JSON et son ETag sont calculés une seule
+    fois par version du classement.
+    """
+
+    def __init__(self, size=10, ttl=60.0, serialize=json.dumps):
+        self.size = size
+        self.ttl = ttl
+        self.serialize = serialize
+        self._lock = threading.Lock()
+        self._entries = None  # triés par score décroissant
+        self._keys = []  # -score de chaque entrée, pour bisect
+        self._loaded_at = 0.0
+        self._payload = None  # (corps JSON, ETag)
+        self.hits = 0
+        self.misses = 0
+
+    def _set(self, entries):
+        entries = sorted(entries, key=lambda e: e['score'], reverse=True)[:self.size]
+        self._entries = entries
+        self._keys = [-e['score'] for e in entries]
+        self._payload = None
+
+    def snapshot(self, loader):
+        """Renvoyer (corps JSON, ETag) du classement, rechargé si expiré."""
+        with self._lock:
+            if self._entries is None or time.monotonic() - self._loaded_at > self.ttl:
+                self.misses += 1
+                self._set(loader(self.size))
+                self._loaded_at = time.monotonic()
+            else:
+                self.hits += 1
+            if self._payload is None:
+                body = self.serialize(self._entries)
+                etag = hashlib.sha1(body.encode('utf-8')).hexdigest()[:20]
+                self._payload = (body, etag)
+            return self._payload
+
+    def offer(self, entry):
+        """Insérer un score fraîchement enregistré s'il entre dans le top.
+
+        Renvoie True si le classement a changé.
+        """
+        with self._lock:
+            if self._entries is None:
+                return False
+            if len(self._entries) >= self.size and entry['score'] <= self._entries[-1]['score']:
+                return False
+            # Après les scores égaux déjà présents, comme un ORDER BY stable
+            index = bisect.bisect_right(self._keys, -entry['score'])
+            self._entries.insert(index, entry)
+            self._keys.insert(index, -entry['score'])
+            del self._entries[self.size:]
+            del self._keys[self.size:]
+            self._payload = None
+            return True
+
+    def invalidate(self):
+        """Oublier le classement ; le prochain accès le rechargera."""
+        with self._lock:
+            self._entries = None
+            self._keys = []
+            self._payload = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries or ()),
+                'size': self.size,
+                'ttl': self.ttl,
+            }
+
+
+class _Fenwick:
+    """Arbre de Fenwick : sommes préfixes et recherche par rang en O(log n)."""
+
+    def __init__(self, counts):
+        self.size = len(counts)
+        self.tree = [0] * (self.size + 1)
+        for index, count in enumerate(counts):
+            if count:
+                self.add(index, count)
+
+    def add(self, index, delta):
+        index += 1
+        while index <= self.size:
+            self.tree[index] += delta
+            index += index & -index
+
+    def prefix(self, index):
+        """Somme des comptes des indices < `index`."""
+        total = 0
+        while index > 0:
+            total += self.tree[index]
+            index -= index & -index
+        return total
+
+    def find(self, k):
+        """Plus petit indice dont la somme préfixe (incluse) dépasse `k` ; renvoie (indice, reste)."""
+        position = 0
+        step = 1 << self.size.bit_length()
+        while step:
+            following = position + step
+            if following <= self.size and self.tree[following] <= k:
+                position = following
+                k -= self.tree[following]
+            step >>= 1
+        return position, k
+
+
+class RankedLeaderboard:
+    """Classement complet : meilleur score de chaque joueur, rang en O(log n).
+
+    Les scores sont répartis dans des tranches de `bucket_width` points ; un
+    arbre de Fenwick compte les joueurs par tranche et chaque tranche garde
+    ses entrées triées. Le rang d'un joueur et la page à un décalage donné
+    se calculent sans parcourir le classement. À score égal, le score le plus
+    ancien passe devant.
+    """
+
+    def __init__(self, bucket_width=1000, ttl=300.0):
+        self.bucket_width = bucket_width
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._loaded_at = None
+        self._reset()
+
+    def _reset(self, capacity=64):
+        self._entries = {}  # user_id -> entrée
+        self._keys = {}  # user_id -> clé de tri
+        self._buckets = {}  # tranche -> clés triées (ordre croissant)
+        self._usernames = {}
+        self._tree = _Fenwick([0] * capacity)
+        self._count = 0
+
+    @staticmethod
+    def _key(user_id, entry):
+        created_at = entry.get('created_at')
+        timestamp = created_at.timestamp() if hasattr(created_at, 'timestamp') else 0.0
+        # Ordre croissant : le meilleur joueur est le dernier
+        return (entry['score'], -timestamp, user_id)
+
+    def _bucket(self, score):
+        return max(0, score) // self.bucket_width
+
+    def _grow(self, bucket):
+        capacity = self._tree.size
+        while capacity <= bucket:
+            capacity *= 2
+        counts = [0] * capacity
+        for index, keys in self._buckets.items():
+            counts[index] = len(keys)
+        self._tree = _Fenwick(counts)
+
+    def _insert(self, user_id, entry):
+        key = self._key(user_id, entry)
+        bucket = self._bucket(entry['score'])
+        if bucket >= self._tree.size:
+            self._grow(bucket)
+        bisect.insort(self._buckets.setdefault(bucket, []), key)
+        self._tree.add(bucket, 1)
+        self._entries[user_id] = entry
+        self._keys[user_id] = key
+        if entry.get('username'):
+            self._usernames[entry['username']] = user_id
+        self._count += 1
+
+    def _remove(self, user_id):
+        key = self._keys.pop(user_id)
+        bucket = self._bucket(key[0])
+        keys = self._buckets[bucket]
+        del keys[bisect.bisect_left(keys, key)]
+        if not keys:
+            del self._buckets[bucket]
+        self._tree.add(bucket, -1)
+        del self._entries[user_id]
+        self._count -= 1
+
+    def load(self, rows):
+        """Remplacer le classement par `rows` (dicts avec user_id, username, score...)."""
+        with self._lock:
+            self._reset()
+            for row in rows:
+                entry = dict(row)
+                user_id = str(entry.pop('user_id'))
+                current = self._keys.get(user_id)
+                if current is None or self._key(user_id, entry) > current:
+                    if current is not None:
+                        self._remove(user_id)
+                    self._insert(user_id, entry)
+            self._loaded_at = time.monotonic()
+
+    def ensure_loaded(self, loader):
+        """Charger le classement via `loader()` au premier accès ou après `ttl`."""
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+                self.load(loader())
+
+    def offer(self, user_id, entry):
+        """Prendre en compte un score ; renvoie True si c'est le meilleur du joueur."""
+        user_id = str(user_id)
+        with self._lock:
+            if self._loaded_at is None:
+                return False
+            current = self._keys.get(user_id)
+            if current is not None:
+                if entry['score'] <= current[0]:
+                    return False
+                self._remove(user_id)
+            self._insert(user_id, dict(entry))
+            return True
+
+    def _position_key(self, position):
+        """Clé de l'entrée à la position `position` (0 = premier)."""
+        bucket, index = self._tree.find(self._count - 1 - position)
+        return self._buckets[bucket][index]
+
+    def _greater(self, key):
+        """Nombre d'entrées strictement meilleures que `key`."""
+        bucket = self._bucket(key[0])
+        keys = self._buckets[bucket]
+        after = len(keys) - bisect.bisect_right(keys, key)
+        return self._count - self._tree.prefix(bucket + 1) + after
+
+    def rank(self, user_id=None, username=None):
+        """Rang du joueur : dict (rank, position, total, entry) ou None."""
+        with self._lock:
+            user_id = self._usernames.get(username) if user_id is None else str(user_id)
+            key = self._keys.get(user_id)
+            if key is None:
+                return None
+            position = self._greater(key)
+            # Rang « sportif » : les scores égaux partagent le même rang
+            rank = 1 + self._greater((key[0], float('inf'), ''))
+            return {
+                'rank': rank,
+                'position': position,
+                'total': self._count,
+                'entry': self._entries[user_id],
+            }
+
+    def page(self, offset=0, limit=10):
+        """Entrées de `offset` à `offset + limit`, chacune avec son rang."""
+        with self._lock:
+            entries = []
+            for position in range(offset, min(self._count, offset + limit)):
+                key = self._position_key(position)
+                entry = self._entries[key[2]]
+                rank = 1 + self._greater((key[0], float('inf'), ''))
+                entries.append(dict(entry, rank=rank))
+            return entries
+
+    def __len__(self):
+        return self._count
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': self._count,
+                'buckets': len(self._buckets),
+                'loaded': int(self._loaded_at is not None),
+            }
+
+
+class RollupCompactor:
+    """Thread qui appelle `compact()` toutes les `interval` secondes.
+
+    `compact` supprime les tranches anciennes des classements par période
+    et renvoie le nombre de lignes supprimées. Plusieurs workers peuvent le
+    lancer : la suppression est idempotente.
+    """
+
+    def __init__(self, compact, interval=3600.0):
+        self.compact = compact
+        self.interval = interval
+        self._stopping = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._metrics = {'runs': 0, 'removed': 0, 'errors': 0}
+
+    def start(self):
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name='rollup-compactor', daemon=True)
+            self._thread.start()
+
+    def run_once(self):
+        try:
+            removed = self.compact()
+        except Exception:
+            with self._lock:
+                self._metrics['errors'] += 1
+            return None
+        with self._lock:
+            self._metrics['runs'] += 1
+            self._metrics['removed'] += removed or 0
+        return removed
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            self.run_once()
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self):
+        with self._lock:
+            return dict(self._metrics)
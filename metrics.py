@@ -0,0 +1,316 @@
+"""
+Métriques de l'application au format texte de Prometheus.
+Histogrammes de latence, compteurs, jauges calculées à la lecture, et profileur
+par échantillonnage des requêtes lentes."""
+
+import bisect
+import os
+import sys
+import threading
+import time
+from collections import Counter as _StackCounter
+from functools import wraps
+
+from serving import current_task, native
+
+# Secondes ; de la demi-milliseconde à la dizaine de secondes
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Pour les opérations en mémoire (méthodes du jeu, sérialisation JSON)
+FAST_BUCKETS = (0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01, 0.1)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Histogramme à seaux fixes, une série par combinaison d'étiquettes."""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # valeurs d'étiquettes -> [comptes par seau..., somme, total]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def collect(self):
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for label_values, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), values):
+                cumulative += count
+                labels = _format_labels(self.labels, label_values, f'le="{_format_value(float(bound))}"')
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _format_labels(self.labels, label_values)
+            yield f'{self.name}_sum{labels} {_format_value(values[-2])}'
+            yield f'{self.name}_count{labels} {values[-1]}'
+
+
+class Counter:
+    """Compteur cumulatif, une série par combinaison d'étiquettes."""
+
+    type = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            values = dict(self._values)
+        for label_values, value in sorted(values.items()):
+            yield f'{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}'
+
+
+class Gauge:
+    """Jauge calculée à chaque lecture par `read` (valeur, ou dict étiquette -> valeur)."""
+
+    type = 'gauge'
+
+    def __init__(self, name, documentation, read, label=None):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+        self.label = label
+
+    def collect(self):
+        value = self.read()
+        if self.label is None:
+            yield f'{self.name} {_format_value(value)}'
+            return
+        for key, item in sorted(value.items()):
+            yield f'{self.name}{_format_labels((self.label,), (key,))} {_format_value(item)}'
+
+
+class MetricsRegistry:
+    """Ensemble des métriques exposées par /metrics."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def counter(self, name, documentation, labels=()):
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, read, label=None):
+        return self.register(Gauge(name, documentation, read, label))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+class TimedCursor:
+    """Curseur qui signale la durée de chaque exécution et lecture à `observe`."""
+
+    def __init__(self, cursor, observe):
+        self._cursor = cursor
+        self._observe = observe
+
+    def _timed(self, method, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            self._observe(time.perf_counter() - started)
+
+    def execute(self, *args, **kwargs):
+        return self._timed(self._cursor.execute, *args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        return self._timed(self._cursor.executemany, *args, **kwargs)
+
+    def fetchone(self):
+        return self._timed(self._cursor.fetchone)
+
+    def fetchmany(self, *args, **kwargs):
+        return self._timed(self._cursor.fetchmany, *args, **kwargs)
+
+    def fetchall(self):
+        return self._timed(self._cursor.fetchall)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class TimedConnection:
+    """Connexion dont les curseurs sont des TimedCursor ; le reste est délégué."""
+
+    def __init__(self, conn, observe):
+        self._conn = conn
+        self._observe = observe
+
+    def cursor(self, *args, **kwargs):
+        return TimedCursor(self._conn.cursor(*args, **kwargs), self._observe)
+
+    def commit(self):
+        started = time.perf_counter()
+        try:
+            return self._conn.commit()
+        finally:
+            self._observe(time.perf_counter() - started)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def instrument_methods(cls, names, histogram, when=None):
+    """Mesurer la durée des méthodes `names` de `cls` dans `histogram`.
+
+    Seul l'appel le plus externe est compté : hard_drop, qui appelle
+    drop_piece en boucle, compte pour une seule observation. Avec `when`,
+    seuls les appels pour lesquels `when()` est vrai sont mesurés.
+    """
+    local = threading.local()
+
+    def timed(name, method):
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            if getattr(local, 'active', False) or (when is not None and not when()):
+                return method(*args, **kwargs)
+            local.active = True
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                local.active = False
+                histogram.observe(time.perf_counter() - started, name)
+        wrapper.__wrapped_timing__ = True
+        return wrapper
+
+    for name in names:
+        method = getattr(cls, name)
+        if not getattr(method, '__wrapped_timing__', False):
+            setattr(cls, name, timed(name, method))
+
+
+class SlowRequestProfiler:
+    """Profileur par échantillonnage des requêtes lentes.
+
+    Un thread système relève toutes les `interval` secondes la pile des
+    requêtes enregistrées par `begin`. À la fin d'une requête plus longue que
+    `threshold` secondes, `end` écrit ses piles au format « plié » de
+    flamegraph.pl / speedscope (`fonction;fonction;... nombre`) dans
+    `directory`.
+
+    Sous gevent, chaque requête est une greenlet : sa pile est celle où elle
+    est suspendue (`gr_frame`), ou celle du thread qui l'exécute si elle
+    tourne. Le thread d'échantillonnage n'est pas une greenlet, sans quoi il
+    ne tournerait jamais pendant une requête qui calcule sans rendre la main.
+    """
+
+    def __init__(self, threshold, directory='profiles', interval=0.005):
+        self.threshold = threshold
+        self.directory = directory
+        self.interval = interval
+        self._samples = {}  # requête (greenlet ou thread) -> (thread système, Counter des piles)
+        self._lock = native('_thread', 'allocate_lock')()
+        self._sleep = native('time', 'sleep')
+        self._get_ident = native('_thread', 'get_ident')
+        self._started = False
+        self.dumps = 0
+
+    def _ensure_started(self):
+        if not self._started:
+            native('_thread', 'start_new_thread')(self._run, ())
+            self._started = True
+
+    @staticmethod
+    def _stack(frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def _run(self):
+        while True:
+            self._sleep(self.interval)
+            with self._lock:
+                watched = [(task, ident) for task, (ident, _) in self._samples.items()]
+            if not watched:
+                continue
+            frames = sys._current_frames()
+            for task, ident in watched:
+                # Greenlet suspendue : sa propre pile ; sinon celle de son thread
+                frame = getattr(task, 'gr_frame', None) or frames.get(ident)
+                if frame is None:
+                    continue
+                stack = self._stack(frame)
+                with self._lock:
+                    entry = self._samples.get(task)
+                    if entry is not None:
+                        entry[1][stack] += 1
+
+    def begin(self):
+        with self._lock:
+            self._ensure_started()
+            self._samples[current_task()] = (self._get_ident(), _StackCounter())
+
+    def end(self, duration, name):
+        """Arrêter l'échantillonnage de la requête courante ; renvoie le fichier écrit ou None."""
+        with self._lock:
+            entry = self._samples.pop(current_task(), None)
+        samples = entry[1] if entry else None
+        if not samples or duration < self.threshold:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        safe_name = ''.join(c if c.isalnum() else '_' for c in name).strip('_') or 'request'
+        path = os.path.join(
+            self.directory, f'{time.strftime("%Y%m%d-%H%M%S")}-{int(duration * 1000)}ms-{safe_name}.folded'
+        )
+        with open(path, 'w') as f:
+            for stack, count in samples.most_common():
+                f.write(f'{stack} {count}\n')
+        self.dumps += 1
+        return path
@@ -0,0 +1,113 @@
+"""
+Placements finaux possibles d'une pièce, pour les bots, les aides de jeu et
+les adversaires. Les formes sont précompilées (masques et empreinte du dessous
+de chaque rotation) et une chute au-dessus de la pile se calcule avec les
+hauteurs de colonnes, sans parcourir les lignes du plateau."""
+
+from game_engine import (BOARD_HEIGHT, BOARD_WIDTH, COMPILED_SHAPES, FULL_ROW_MASK,
+                         SPAWN_X, _fits, board_rows)
+
+
+def column_tops(rows):
+    """Dernière ligne libre de chaque colonne au-dessus de la pile
+    (BOARD_HEIGHT - 1 pour une colonne vide, -1 pour une colonne pleine)."""
+    tops = [BOARD_HEIGHT - 1] * BOARD_WIDTH
+    seen = 0
+    for y, row in enumerate(rows):
+        new_columns = row & ~seen
+        while new_columns:
+            bit = new_columns & -new_columns
+            tops[bit.bit_length() - 1] = y - 1
+            new_columns ^= bit
+        seen |= row
+        if seen == FULL_ROW_MASK:
+            break
+    return tops
+
+
+def enumerate_placements(rows, piece_type, x, y, rotation=0):
+    """Placements finaux (x, rotation, y) atteignables depuis la position donnée.
+
+    Sont atteignables toutes les positions où la pièce se pose après une
+    suite de mouvements du jeu (gauche, droite, rotation, descente). Tant
+    que la pièce est au-dessus de la pile (« ciel »), chaque couple
+    (x, rotation) est traité en une fois avec les hauteurs de colonnes ;
+    seules les positions sous un surplomb sont parcourues ligne à ligne.
+    Les rotations sont ramenées dans [0, nombre de rotations) ; liste vide
+    si la pièce ne tient pas au départ.
+    """
+    shapes = COMPILED_SHAPES[piece_type]
+    count = len(shapes)
+    tops = column_tops(rows)
+    sky = {}  # (x, rotation) -> ligne de pose depuis le ciel
+    entries = {}  # (x, rotation) -> plus haute ligne atteinte dans le ciel
+    open_sky = []
+    states = set()  # positions atteintes sous un surplomb
+    open_states = []
+    placements = set()
+
+    def sky_y(px, pr):
+        key = (px, pr)
+        if key not in sky:
+            bottoms = shapes[pr].bottoms_by_x.get(px)
+            sky[key] = None if bottoms is None else min(tops[column] - dy for column, dy in bottoms)
+        return sky[key]
+
+    def reach(px, pr, py):
+        """Marquer la position atteinte si la pièce y tient ; renvoie True dans ce cas."""
+        free_y = sky_y(px, pr)
+        if free_y is None:
+            return False
+        if py <= free_y:
+            if py < entries.get((px, pr), BOARD_HEIGHT):
+                entries[(px, pr)] = py
+                open_sky.append((px, pr))
+            return True
+        if (px, pr, py) in states:
+            return True
+        if not _fits(rows, shapes[pr].masks_by_x[px], py):
+            return False
+        states.add((px, pr, py))
+        open_states.append((px, pr, py))
+        return True
+
+    if not reach(x, rotation % count, y):
+        return []
+    while open_sky or open_states:
+        while open_sky:
+            # Dans le ciel : toutes les lignes de l'entrée à la pose sont libres
+            px, pr = open_sky.pop()
+            first, last = entries[(px, pr)], sky[(px, pr)]
+            placements.add((px, pr, last))
+            for nx, nr in ((px - 1, pr), (px + 1, pr), (px, (pr + 1) % count)):
+                free_y = sky_y(nx, nr)
+                if free_y is None:
+                    continue
+                if first <= free_y:
+                    reach(nx, nr, first)
+                # Lignes où le voisin passe sous un surplomb
+                for ny in range(max(first, free_y + 1), last + 1):
+                    reach(nx, nr, ny)
+        while open_states:
+            px, pr, py = open_states.pop()
+            if not reach(px, pr, py + 1):
+                placements.add((px, pr, py))
+            reach(px - 1, pr, py)
+            reach(px + 1, pr, py)
+            reach(px, (pr + 1) % count, py)
+    return sorted(placements, key=lambda placement: (placement[1], placement[0], placement[2]))
+
+
+def game_placements(game, held=False):
+    """Pièce et placements finaux de la pièce courante d'une partie.
+
+    Avec `held`, ceux de la pièce qu'apporterait la réserve (pièce réservée,
+    ou pièce suivante si la réserve est vide), depuis la position d'apparition.
+    """
+    rows = board_rows(game)
+    if held:
+        piece_type = game.held_piece or game.next_piece
+        return piece_type, enumerate_placements(rows, piece_type, SPAWN_X, 0, 0)
+    return game.current_piece, enumerate_placements(
+        rows, game.current_piece, game.piece_x, game.piece_y, game.piece_rotation
+    )
@@ -0,0 +1,264 @@
+"""
+Limitation du débit des actions de jeu par joueur (seau à jetons).
+Les chutes en excès sont regroupées et appliquées à la requête suivante
+au lieu d'être refusées."""
+
+import sqlite3
+import threading
+import time
+
+from serving import offload_methods, thread_local
+
+ALLOWED = 'allowed'
+COALESCED = 'coalesced'
+REJECTED = 'rejected'
+DROPPED = 'dropped'
+
+
+class MemoryTokenBuckets:
+    """Seaux à jetons gardés dans la mémoire du worker.
+
+    Chaque seau contient au plus `burst` jetons et en regagne `rate` par
+    seconde. Un seau plein n'apporte rien : il est oublié quand la table
+    dépasse `max_keys` entrées.
+    """
+
+    name = 'memory'
+
+    def __init__(self, rate, burst, max_keys=100000, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets = {}  # clé -> [jetons, instant, chutes en attente]
+        self._lock = threading.Lock()
+
+    def _bucket(self, key, now):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._forget_full(now)
+            bucket = self._buckets[key] = [float(self.burst), now, 0]
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        return bucket
+
+    def _forget_full(self, now):
+        full = [key for key, (tokens, updated, pending) in self._buckets.items()
+                if not pending and tokens + (now - updated) * self.rate >= self.burst]
+        for key in full:
+            del self._buckets[key]
+
+    def acquire(self, key, cost=1):
+        """Prendre `cost` jetons ; renvoie (accordé, attente avant un nouvel essai)."""
+        with self._lock:
+            bucket = self._bucket(key, self.clock())
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return True, 0.0
+            return False, (cost - bucket[0]) / self.rate
+
+    def defer(self, key, limit):
+        """Mettre une chute en attente ; False si `limit` chutes attendent déjà."""
+        with self._lock:
+            bucket = self._bucket(key, self.clock())
+            if bucket[2] >= limit:
+                return False
+            bucket[2] += 1
+            return True
+
+    def take_deferred(self, key):
+        """Renvoyer et remettre à zéro le nombre de chutes en attente."""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                return 0
+            pending, bucket[2] = bucket[2], 0
+            return pending
+
+    def restore_deferred(self, key, count, limit):
+        """Remettre en attente `count` chutes prises mais non appliquées (au plus `limit`)."""
+        with self._lock:
+            bucket = self._bucket(key, self.clock())
+            bucket[2] = min(limit, bucket[2] + count)
+
+    def forget_idle(self, older_than=3600.0):
+        """Supprimer les seaux inutilisés (tâche de maintenance)."""
+        cutoff = self.clock() - older_than
+        with self._lock:
+            idle = [key for key, (_, updated, pending) in self._buckets.items()
+                    if not pending and updated < cutoff]
+            for key in idle:
+                del self._buckets[key]
+        return len(idle)
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SQLiteTokenBuckets:
+    """Seaux à jetons partagés entre les workers d'une machine (fichier sqlite).
+
+    Chaque décision est une transaction courte (BEGIN IMMEDIATE) : deux
+    workers ne peuvent pas consommer le même jeton. Sous gevent, ces appels
+    passent par le pool de threads du hub (voir SQLiteGameStore).
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, rate, burst, path, timeout=5.0, clock=time.time):
+        self.rate = rate
+        self.burst = burst
+        self.path = path
+        self.timeout = timeout
+        self.clock = clock
+        self._local = thread_local()
+        conn = self._conn()
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS token_buckets (
+                   key TEXT PRIMARY KEY,
+                   tokens REAL NOT NULL,
+                   updated_at REAL NOT NULL,
+                   pending INTEGER NOT NULL DEFAULT 0
+               )"""
+        )
+        conn.commit()
+        offload_methods(self, ('acquire', 'defer', 'take_deferred', 'restore_deferred',
+                               'forget_idle', '_count'))
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _update(self, key, change):
+        """Appliquer `change(jetons, en attente)` -> (jetons, en attente, résultat) au seau."""
+        conn = self._conn()
+        now = self.clock()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated_at, pending FROM token_buckets WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                tokens, pending = float(self.burst), 0
+            else:
+                tokens = min(self.burst, row[0] + max(0.0, now - row[1]) * self.rate)
+                pending = row[2]
+            tokens, pending, result = change(tokens, pending)
+            conn.execute(
+                """INSERT INTO token_buckets (key, tokens, updated_at, pending) VALUES (?, ?, ?, ?)
+                   ON CONFLICT (key) DO UPDATE SET
+                       tokens = excluded.tokens, updated_at = excluded.updated_at, pending = excluded.pending""",
+                (key, tokens, now, pending),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def acquire(self, key, cost=1):
+        def change(tokens, pending):
+            if tokens >= cost:
+                return tokens - cost, pending, (True, 0.0)
+            return tokens, pending, (False, (cost - tokens) / self.rate)
+        return self._update(key, change)
+
+    def defer(self, key, limit):
+        def change(tokens, pending):
+            if pending >= limit:
+                return tokens, pending, False
+            return tokens, pending + 1, True
+        return self._update(key, change)
+
+    def take_deferred(self, key):
+        return self._update(key, lambda tokens, pending: (tokens, 0, pending))
+
+    def restore_deferred(self, key, count, limit):
+        return self._update(key, lambda tokens, pending: (tokens, min(limit, pending + count), None))
+
+    def forget_idle(self, older_than=3600.0):
+        """Supprimer les seaux inutilisés (tâche de maintenance)."""
+        conn = self._conn()
+        cur = conn.execute(
+            "DELETE FROM token_buckets WHERE pending = 0 AND updated_at < ?", (self.clock() - older_than,)
+        )
+        return cur.rowcount
+
+    def _count(self):
+        return self._conn().execute("SELECT COUNT(*) FROM token_buckets").fetchone()[0]
+
+    def __len__(self):
+        return self._count()
+
+
+def create_token_buckets(backend='memory', rate=30.0, burst=60, path=None):
+    """Construire les seaux à jetons configurés."""
+    if backend == MemoryTokenBuckets.name:
+        return MemoryTokenBuckets(rate, burst)
+    if backend == SQLiteTokenBuckets.name:
+        return SQLiteTokenBuckets(rate, burst, path or 'tetris_rate_limits.db')
+    raise ValueError(f"Limiteur de débit inconnu: {backend}")
+
+
+class ActionLimiter:
+    """Décide du sort de chaque requête d'action d'un joueur.
+
+    Une requête qui obtient un jeton est acceptée avec les chutes mises en
+    attente depuis la précédente. Sans jeton, une chute (`coalescible`) est
+    mise en attente, au plus `max_deferred` par joueur au-delà desquelles
+    elle est abandonnée ; les autres actions sont refusées avec le délai
+    avant un nouvel essai.
+    """
+
+    def __init__(self, buckets, max_deferred=20):
+        self.buckets = buckets
+        self.max_deferred = max_deferred
+        self._lock = threading.Lock()
+        self._metrics = {ALLOWED: 0, COALESCED: 0, REJECTED: 0, DROPPED: 0, 'applied_deferred': 0}
+
+    def admit(self, key, coalescible=False, cost=1):
+        """Renvoyer (décision, chutes à appliquer d'abord ou délai avant un nouvel essai).
+
+        `cost` : jetons consommés par la requête (une par action d'un lot) ; un
+        lot plus grand que la rafale coûte un seau plein.
+        """
+        cost = max(1, min(cost, self.buckets.burst))
+        allowed, retry_after = self.buckets.acquire(key, cost)
+        if allowed:
+            deferred = self.buckets.take_deferred(key)
+            decision, value = ALLOWED, deferred
+        elif coalescible:
+            decision = COALESCED if self.buckets.defer(key, self.max_deferred) else DROPPED
+            value = 0
+        else:
+            decision, value = REJECTED, retry_after
+        with self._lock:
+            self._metrics[decision] += 1
+            if decision == ALLOWED:
+                self._metrics['applied_deferred'] += value
+        return decision, value
+
+    def forget_idle(self):
+        """Oublier les seaux restés inutilisés le temps de se remplir (sans perte :
+        un seau plein équivaut à un seau absent) ; renvoie leur nombre."""
+        return self.buckets.forget_idle(self.buckets.burst / self.buckets.rate)
+
+    def restore(self, key, count):
+        """Remettre en attente des chutes accordées par `admit` mais pas appliquées
+        (requête invalide ou en erreur) : elles partent avec l'action suivante."""
+        self.buckets.restore_deferred(key, count, self.max_deferred)
+        with self._lock:
+            self._metrics['applied_deferred'] -= count
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._metrics)
+        stats['buckets'] = len(self.buckets)
+        return stats
@@ -0,0 +1,263 @@
+"""
+Écriture différée des scores.
+Les fins de partie sont regroupées et insérées par lots, hors des requêtes."""
+
+import base64
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {'__bytes__': base64.b64encode(bytes(value)).decode('ascii')}
+    raise TypeError(f"Valeur non sérialisable: {type(value).__name__}")
+
+
+def _decode_value(obj):
+    if '__datetime__' in obj:
+        return datetime.fromisoformat(obj['__datetime__'])
+    if '__bytes__' in obj:
+        return base64.b64decode(obj['__bytes__'])
+    return obj
+
+
+def dumps_record(record):
+    return json.dumps(record, default=_encode_value, separators=(',', ':'))
+
+
+def loads_record(line):
+    return json.loads(line, object_hook=_decode_value)
+
+
+class ScoreWriter:
+    """Tampon d'écriture des scores, vidé par lots.
+
+    `add` ne fait qu'ajouter l'enregistrement au tampon. Un thread appelle
+    `write(lot)` dès que `max_rows` enregistrements attendent ou au plus
+    tard `max_delay` secondes après le premier, puis `on_flushed(lot)` une
+    fois le lot validé. Un lot en échec est remis en tête du tampon et
+    retenté. À l'arrêt, ce qui n'a pas pu être écrit est ajouté à
+    `spill_path` (une ligne JSON par score) et relu au démarrage suivant.
+
+    Après `max_retries` échecs de suite (ou dès une erreur pour laquelle
+    `is_permanent(erreur)` est vrai), le lot est coupé en deux jusqu'à isoler
+    les scores qui échouent seuls : ceux-ci sont écartés dans
+    `quarantine_path` avec leur erreur et le reste du tampon continue
+    d'être écrit. Avec `is_permanent`, un score isolé dont l'erreur n'est
+    pas permanente (base indisponible) est remis en tête du tampon.
+    """
+
+    def __init__(self, write, max_rows=100, max_delay=0.2, spill_path=None, on_flushed=None,
+                 retry_delay=1.0, max_retries=3, quarantine_path=None, is_permanent=None):
+        self.write = write
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.spill_path = spill_path
+        self.on_flushed = on_flushed
+        self.retry_delay = retry_delay
+        self.max_retries = max_retries
+        self.quarantine_path = quarantine_path
+        self.is_permanent = is_permanent
+        self._failures = 0  # échecs consécutifs du lot en tête du tampon
+        self._buffer = deque()
+        self._oldest = None  # instant d'arrivée du plus ancien enregistrement en attente
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()  # un seul lot en cours d'écriture
+        self._thread = None
+        self._stopping = False
+        self._metrics = {
+            'added': 0,
+            'written': 0,
+            'batches': 0,
+            'failed_batches': 0,
+            'isolated_batches': 0,
+            'quarantined': 0,
+            'spilled': 0,
+            'restored': 0,
+            'write_time': 0.0,
+        }
+
+    def start(self):
+        """Relire les scores déversés lors d'un arrêt précédent et lancer le thread."""
+        self._restore_spill()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='score-writer', daemon=True)
+            self._thread.start()
+
+    def add(self, record):
+        with self._cond:
+            first = not self._buffer
+            if first:
+                self._oldest = time.monotonic()
+            self._buffer.append(record)
+            self._metrics['added'] += 1
+            # Réveiller le thread pour armer le délai, ou écrire un lot complet
+            if first or len(self._buffer) >= self.max_rows:
+                self._cond.notify()
+
+    def _due(self):
+        """Un lot est prêt (verrou tenu) ; renvoie le délai restant sinon."""
+        if not self._buffer:
+            return None
+        if len(self._buffer) >= self.max_rows or self._stopping:
+            return 0
+        return max(0.0, self._oldest + self.max_delay - time.monotonic())
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopping:
+                        return
+                    remaining = self._due()
+                    if remaining == 0:
+                        break
+                    self._cond.wait(remaining)
+            if not self.flush():
+                time.sleep(self.retry_delay)
+
+    def flush(self):
+        """Écrire un lot en attente ; renvoie False si l'écriture a échoué."""
+        with self._flush_lock:
+            with self._cond:
+                batch = [self._buffer.popleft() for _ in range(min(self.max_rows, len(self._buffer)))]
+                self._oldest = time.monotonic() if self._buffer else None
+            if not batch:
+                return True
+            started = time.perf_counter()
+            try:
+                self.write(batch)
+            except Exception as error:
+                self._failures += 1
+                if self._failures < self.max_retries and not self._permanent(error):
+                    self._requeue(batch, failed=True)
+                    return False
+                written, rest = self._write_isolating(batch)
+            else:
+                written, rest = batch, []
+            if rest:
+                self._requeue(rest, failed=True)
+            else:
+                self._failures = 0
+            with self._cond:
+                self._metrics['written'] += len(written)
+                self._metrics['batches'] += 1
+                self._metrics['write_time'] += time.perf_counter() - started
+        if written and self.on_flushed:
+            self.on_flushed(written)
+        return not rest
+
+    def _requeue(self, records, failed=False):
+        with self._cond:
+            self._buffer.extendleft(reversed(records))
+            self._oldest = time.monotonic()
+            if failed:
+                self._metrics['failed_batches'] += 1
+
+    def _write_isolating(self, batch):
+        """Écrire `batch` par moitiés jusqu'à isoler les scores en échec.
+
+        Renvoie (scores écrits, scores à retenter) ; les scores en échec
+        permanent sont mis en quarantaine.
+        """
+        with self._cond:
+            self._metrics['isolated_batches'] += 1
+        written = []
+        parts = [batch]
+        while parts:
+            part = parts.pop()
+            try:
+                self.write(part)
+            except Exception as error:
+                if len(part) > 1:
+                    middle = len(part) // 2
+                    parts.append(part[middle:])
+                    parts.append(part[:middle])
+                elif self.is_permanent is None or self._permanent(error):
+                    self._quarantine(part[0], error)
+                else:
+                    # Panne : tout ce qui n'est pas écrit sera retenté
+                    return written, part + [record for rest in reversed(parts) for record in rest]
+            else:
+                written.extend(part)
+        return written, []
+
+    def _permanent(self, error):
+        return self.is_permanent is not None and self.is_permanent(error)
+
+    def _quarantine(self, record, error):
+        with self._cond:
+            self._metrics['quarantined'] += 1
+        if not self.quarantine_path:
+            return
+        line = dumps_record({'error': f'{type(error).__name__}: {error}'.strip(), 'record': record})
+        fd = os.open(self.quarantine_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        try:
+            os.write(fd, (line + '\n').encode('utf-8'))
+        finally:
+            os.close(fd)
+
+    def stop(self, timeout=5.0):
+        """Vider le tampon puis déverser sur disque ce qui n'a pas pu être écrit."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        deadline = time.monotonic() + timeout
+        while self.pending() and time.monotonic() < deadline:
+            if not self.flush():
+                break
+        self._spill()
+
+    def _spill(self):
+        with self._cond:
+            records = list(self._buffer)
+            self._buffer.clear()
+        if not records or not self.spill_path:
+            return
+        # Une seule écriture en mode ajout : plusieurs workers peuvent partager le fichier
+        data = ''.join(dumps_record(record) + '\n' for record in records).encode('utf-8')
+        fd = os.open(self.spill_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        try:
+            os.write(fd, data)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        with self._cond:
+            self._metrics['spilled'] += len(records)
+
+    def _restore_spill(self):
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return
+        # Renommer avant de lire : un seul worker reprend le fichier
+        claimed = f'{self.spill_path}.{os.getpid()}'
+        try:
+            os.rename(self.spill_path, claimed)
+        except OSError:
+            return
+        with open(claimed, encoding='utf-8') as f:
+            records = [loads_record(line) for line in f if line.strip()]
+        for record in records:
+            self.add(record)
+        with self._cond:
+            self._metrics['restored'] += len(records)
+        os.remove(claimed)
+
+    def pending(self):
+        with self._cond:
+            return len(self._buffer)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._metrics)
+            stats['pending'] = len(self._buffer)
+            stats['max_rows'] = self.max_rows
+        return stats
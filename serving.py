@@ -0,0 +1,76 @@
+"""
+Service asynchrone de l'application sous gunicorn avec des workers gevent.
+Chaque requête est une greenlet ; les accès PostgreSQL deviennent asynchrones
+(psycopg2 rend la main à la boucle pendant l'attente du serveur) et les calculs
+longs sont confiés au pool de threads du hub pour ne pas bloquer la boucle."""
+
+import importlib
+import threading
+from functools import wraps
+
+
+def cooperative():
+    """True si le processus tourne sous gevent (modules standard patchés)."""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('socket')
+
+
+def enable_async_db():
+    """Rendre psycopg2 coopératif : les requêtes sont envoyées en mode
+    asynchrone et l'attente passe par select, que gevent rend non bloquant."""
+    import psycopg2.extensions
+    import psycopg2.extras
+
+    psycopg2.extensions.set_wait_callback(psycopg2.extras.wait_select)
+
+
+def offload(func):
+    """Exécuter `func` dans un vrai thread du hub gevent (rejeu des parties,
+    calculs de plusieurs millisecondes) ; inchangé hors de gevent."""
+    if not cooperative():
+        return func
+    from gevent import get_hub
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return get_hub().threadpool.apply(func, args, kwargs)
+    return wrapper
+
+
+def offload_methods(obj, names):
+    """Remplacer les méthodes `names` de `obj` par des versions exécutées dans
+    le pool de threads du hub (appels sqlite3 bloquants, attente de verrou) ;
+    sans effet hors de gevent. Un appel depuis le pool s'y exécute directement."""
+    if cooperative():
+        for name in names:
+            setattr(obj, name, offload(getattr(obj, name)))
+
+
+def thread_local():
+    """Stockage propre au thread système, même sous gevent (où threading.local
+    est propre à chaque greenlet, donc à chaque requête)."""
+    if cooperative():
+        from gevent import monkey
+        return monkey.get_original('threading', 'local')()
+    return threading.local()
+
+
+def native(module, name):
+    """Fonction d'origine de la bibliothèque standard (`native('time', 'sleep')`),
+    même si gevent l'a remplacée par une version coopérative."""
+    if cooperative():
+        from gevent import monkey
+        return monkey.get_original(module, name)
+    return getattr(importlib.import_module(module), name)
+
+
+def current_task():
+    """Unité d'exécution courante : la greenlet sous gevent, sinon l'identifiant
+    du thread (threading.get_ident ne distingue pas les greenlets d'un thread)."""
+    if cooperative():
+        from greenlet import getcurrent
+        return getcurrent()
+    return threading.get_ident()
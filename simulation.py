@@ -0,0 +1,527 @@
+"""
+Simulation de parties de Tetris sans Flask.
+Parties initialisées par graine, politiques de jeu interchangeables (aléatoire,
+gloutonne) et statistiques agrégées, plus un mode NumPy qui fait avancer des
+milliers de plateaux à la fois."""
+
+import random
+import statistics
+from datetime import datetime
+
+from game_engine import (BOARD_HEIGHT, BOARD_WIDTH, COMPILED_SHAPES, FULL_ROW_MASK,
+                         PIECE_TYPES, SPAWN_X, TetrisGame, _fits, board_rows)
+
+# Horloge figée : les parties simulées ne dépendent pas de l'heure réelle
+SIM_EPOCH = datetime(2024, 1, 1)
+
+# Poids de la politique gloutonne (hauteur cumulée, lignes, trous, irrégularité)
+GREEDY_WEIGHTS = {
+    'aggregate_height': -0.510066,
+    'lines': 0.760666,
+    'holes': -0.35663,
+    'bumpiness': -0.184483,
+}
+
+# Placements candidats de chaque pièce : (rotation, x, forme compilée),
+# rotations puis colonnes dans l'ordre croissant
+PLACEMENT_CANDIDATES = {
+    piece_type: tuple(
+        (rotation, x, shape)
+        for rotation, shape in enumerate(shapes)
+        for x in sorted(shape.masks_by_x)
+    )
+    for piece_type, shapes in COMPILED_SHAPES.items()
+}
+
+
+def fixed_clock():
+    return SIM_EPOCH
+
+
+def landing_y(rows, shape, x, y=0):
+    """Ligne où la pièce s'arrête en tombant depuis `y` (None si `y` est occupé)."""
+    masks = shape.masks_by_x[x]
+    if not _fits(rows, masks, y):
+        return None
+    while _fits(rows, masks, y + 1):
+        y += 1
+    return y
+
+
+def board_features(rows):
+    """Hauteur cumulée, trous et irrégularité d'un plateau (masques de lignes)."""
+    heights = [0] * BOARD_WIDTH
+    seen = 0
+    holes = 0
+    for y, row in enumerate(rows):
+        holes += (seen & ~row).bit_count()
+        new_columns = row & ~seen
+        while new_columns:
+            bit = new_columns & -new_columns
+            heights[bit.bit_length() - 1] = BOARD_HEIGHT - y
+            new_columns ^= bit
+        seen |= row
+    bumpiness = sum(abs(heights[x] - heights[x + 1]) for x in range(BOARD_WIDTH - 1))
+    return sum(heights), holes, bumpiness
+
+
+def place_rows(rows, shape, x, y):
+    """Plateau après pose et effacement des lignes : (lignes, nb de lignes effacées)."""
+    rows = list(rows)
+    for dy, mask in shape.masks_by_x[x]:
+        rows[y + dy] |= mask
+    kept = [row for row in rows if row != FULL_ROW_MASK]
+    cleared = BOARD_HEIGHT - len(kept)
+    return [0] * cleared + kept, cleared
+
+
+class RandomPolicy:
+    """Choisit un placement au hasard parmi ceux accessibles depuis l'apparition."""
+
+    name = 'random'
+
+    def __init__(self, rng):
+        self.rng = rng
+
+    def choose(self, game):
+        rows = board_rows(game)
+        candidates = [
+            (rotation, x) for rotation, x, shape in PLACEMENT_CANDIDATES[game.current_piece]
+            if _fits(rows, shape.masks_by_x[x], game.piece_y)
+        ]
+        return self.rng.choice(candidates) if candidates else None
+
+
+class GreedyPolicy:
+    """Choisit le placement qui maximise une évaluation linéaire du plateau obtenu."""
+
+    name = 'greedy'
+
+    def __init__(self, rng=None, weights=None):
+        self.weights = dict(GREEDY_WEIGHTS, **(weights or {}))
+
+    def evaluate(self, rows, cleared):
+        aggregate_height, holes, bumpiness = board_features(rows)
+        weights = self.weights
+        return (weights['aggregate_height'] * aggregate_height
+                + weights['lines'] * cleared
+                + weights['holes'] * holes
+                + weights['bumpiness'] * bumpiness)
+
+    def choose(self, game):
+        rows = board_rows(game)
+        best = None
+        best_score = None
+        for rotation, x, shape in PLACEMENT_CANDIDATES[game.current_piece]:
+            y = landing_y(rows, shape, x, game.piece_y)
+            if y is None:
+                continue
+            score = self.evaluate(*place_rows(rows, shape, x, y))
+            if best_score is None or score > best_score:
+                best, best_score = (rotation, x), score
+        return best
+
+
+POLICIES = {
+    RandomPolicy.name: RandomPolicy,
+    GreedyPolicy.name: GreedyPolicy,
+}
+
+
+def simulate_game(seed, policy='greedy', engine='bitboard', max_pieces=None):
+    """Jouer une partie complète avec une graine donnée ; renvoie son résultat.
+
+    La pièce est placée directement à la rotation et à la colonne choisies
+    sur sa ligne d'apparition, puis lâchée (hard drop).
+    """
+    game = TetrisGame(None, engine=engine, rng=random.Random(seed), clock=fixed_clock)
+    player = POLICIES[policy](random.Random(seed * 2 + 1))
+    while not game.game_over and (max_pieces is None or game.total_pieces < max_pieces):
+        choice = player.choose(game)
+        if choice is not None:
+            game.piece_rotation, game.piece_x = choice
+        game.hard_drop()
+    return game_result(game, seed, policy)
+
+
+def game_result(game, seed, policy):
+    return {
+        'seed': seed,
+        'policy': policy,
+        'score': game.score,
+        'lines_cleared': game.lines_cleared,
+        'level': game.level,
+        'pieces': game.total_pieces,
+        'max_combo': game.max_combo,
+        'perfect_clears': game.perfect_clears,
+        'game_over': game.game_over,
+        'piece_stats': dict(game.piece_stats),
+    }
+
+
+def run_batch(seeds, policy='greedy', engine='bitboard', max_pieces=None):
+    """Simuler une partie par graine, dans l'ordre des graines."""
+    return [simulate_game(seed, policy, engine, max_pieces) for seed in seeds]
+
+
+def _percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _distribution(values):
+    values = sorted(values)
+    return {
+        'mean': statistics.fmean(values),
+        'stdev': statistics.pstdev(values),
+        'min': values[0],
+        'p10': _percentile(values, 0.10),
+        'median': _percentile(values, 0.50),
+        'p90': _percentile(values, 0.90),
+        'max': values[-1],
+    }
+
+
+def aggregate(results, histogram_bins=10):
+    """Statistiques agrégées d'une liste de résultats de parties."""
+    if not results:
+        return {'games': 0}
+    scores = [result['score'] for result in results]
+    piece_totals = {piece_type: 0 for piece_type in PIECE_TYPES}
+    for result in results:
+        for piece_type, count in result['piece_stats'].items():
+            piece_totals[piece_type] += count
+    total_pieces = sum(piece_totals.values())
+
+    # Histogramme des scores en tranches de largeur égale
+    low, high = min(scores), max(scores)
+    width = max(1, -(-(high - low + 1) // histogram_bins))
+    histogram = [0] * histogram_bins
+    for score in scores:
+        histogram[min(histogram_bins - 1, (score - low) // width)] += 1
+
+    return {
+        'games': len(results),
+        'score': _distribution(scores),
+        'score_histogram': {
+            'start': low,
+            'bin_width': width,
+            'counts': histogram,
+        },
+        'lines_cleared': _distribution([result['lines_cleared'] for result in results]),
+        'pieces': _distribution([result['pieces'] for result in results]),
+        'level': _distribution([result['level'] for result in results]),
+        'max_combo': max(result['max_combo'] for result in results),
+        'perfect_clears': sum(result['perfect_clears'] for result in results),
+        'piece_stats': piece_totals,
+        'piece_frequencies': {
+            piece_type: count / total_pieces if total_pieces else 0.0
+            for piece_type, count in piece_totals.items()
+        },
+    }
+
+
+class VectorizedSimulator:
+    """Simulation de nombreux plateaux en parallèle avec NumPy.
+
+    Chaque plateau est un tableau de masques de lignes (uint16) ; à chaque
+    pas, tous les placements candidats de tous les plateaux sont évalués en
+    une fois. Les règles de score sont celles de TetrisGame.clear_lines et
+    de hard_drop. Les pièces sont tirées par un générateur NumPy, donc les
+    parties diffèrent de celles de `simulate_game` pour une même graine.
+    """
+
+    def __init__(self, policy='greedy', batch_size=1024, weights=None):
+        try:
+            import numpy
+        except ImportError as exc:
+            raise ImportError("Le mode vectorisé nécessite NumPy (pip install numpy)") from exc
+        if policy not in POLICIES:
+            raise ValueError(f"Politique inconnue: {policy}")
+        self.np = numpy
+        self.policy = policy
+        self.batch_size = batch_size
+        self.weights = dict(GREEDY_WEIGHTS, **(weights or {}))
+        self._build_tables()
+
+    def _build_tables(self):
+        np = self.np
+        max_candidates = max(len(candidates) for candidates in PLACEMENT_CANDIDATES.values())
+        max_rows = max(len(shape.rows) for shapes in COMPILED_SHAPES.values() for shape in shapes)
+        count = len(PIECE_TYPES)
+        self.masks = np.zeros((count, max_candidates, max_rows), dtype=np.uint16)
+        self.offsets = np.zeros((count, max_candidates, max_rows), dtype=np.intp)
+        self.valid = np.zeros((count, max_candidates), dtype=bool)
+        self.spawn = np.zeros(count, dtype=np.intp)
+        for piece_id, piece_type in enumerate(PIECE_TYPES):
+            for index, (rotation, x, shape) in enumerate(PLACEMENT_CANDIDATES[piece_type]):
+                self.valid[piece_id, index] = True
+                for k, (dy, mask) in enumerate(shape.masks_by_x[x]):
+                    self.masks[piece_id, index, k] = mask
+                    self.offsets[piece_id, index, k] = dy
+                if rotation == 0 and x == SPAWN_X:
+                    self.spawn[piece_id] = index
+        self.popcount = np.array([bin(mask).count('1') for mask in range(1 << 16)], dtype=np.uint8)
+        # Lignes pleines sous le plateau pour arrêter les pièces
+        self.floor_rows = int(self.offsets.max()) + 1
+
+    def _place_all(self, boards, pieces):
+        """Plateaux après chaque placement candidat : (plateaux, hauteur d'arrivée, valides)."""
+        np = self.np
+        n = boards.shape[0]
+        masks = self.masks[pieces]  # (n, C, K)
+        offsets = self.offsets[pieces]
+        padded = np.concatenate(
+            [boards, np.full((n, self.floor_rows), FULL_ROW_MASK, dtype=np.uint16)], axis=1
+        )
+        ys = np.arange(BOARD_HEIGHT)
+        board_index = np.arange(n)[:, None]
+        overlap = np.zeros(masks.shape[:2] + (BOARD_HEIGHT,), dtype=np.uint16)
+        for k in range(masks.shape[2]):
+            overlap |= padded[board_index[..., None], offsets[..., k, None] + ys] & masks[..., k, None]
+        collides = overlap != 0  # (n, C, H)
+        valid = self.valid[pieces] & ~collides[..., 0]
+        landing = np.argmax(collides, axis=2) - 1
+
+        candidates = masks.shape[1]
+        placed = np.repeat(boards[:, None, :], candidates, axis=1)
+        candidate_index = np.arange(candidates)[None, :]
+        target_rows = np.clip(landing, 0, None)[..., None] + offsets
+        for k in range(masks.shape[2]):
+            placed[board_index, candidate_index, target_rows[..., k]] |= masks[..., k]
+        return placed, landing, valid
+
+    def _greedy_scores(self, placed):
+        np = self.np
+        full = placed == FULL_ROW_MASK
+        cleared = full.sum(axis=-1)
+        # Les lignes pleines disparaissent : seules les autres couvrent des cases
+        remaining = np.where(full, 0, placed)
+        covered = np.bitwise_or.accumulate(remaining, axis=-1)
+        above = np.concatenate([np.zeros_like(covered[..., :1]), covered[..., :-1]], axis=-1)
+        holes = self.popcount[above & ~placed].sum(axis=-1)
+        # Hauteur d'une colonne : lignes non pleines à partir de sa case la plus haute
+        column_bits = np.unpackbits(
+            np.where(full, 0, covered).astype('<u2')[..., None].view(np.uint8),
+            axis=-1, bitorder='little',
+        )
+        heights = column_bits.sum(axis=-2, dtype=np.uint8)[..., :BOARD_WIDTH].astype(np.int64)
+        bumpiness = np.abs(np.diff(heights, axis=-1)).sum(axis=-1)
+        weights = self.weights
+        return (weights['aggregate_height'] * heights.sum(axis=-1)
+                + weights['lines'] * cleared
+                + weights['holes'] * holes
+                + weights['bumpiness'] * bumpiness)
+
+    def _run_chunk(self, count, rng, max_pieces, piece_source=None):
+        np = self.np
+        piece_count = len(PIECE_TYPES)
+        draw = piece_source or (lambda size: rng.integers(0, piece_count, size=size))
+        boards = np.zeros((count, BOARD_HEIGHT), dtype=np.uint16)
+        current = draw(count)
+        upcoming = draw(count)
+        score = np.zeros(count, dtype=np.int64)
+        lines = np.zeros(count, dtype=np.int64)
+        level = np.ones(count, dtype=np.int64)
+        combo = np.zeros(count, dtype=np.int64)
+        max_combo = np.zeros(count, dtype=np.int64)
+        perfect = np.zeros(count, dtype=np.int64)
+        last_cleared = np.zeros(count, dtype=bool)
+        pieces = np.zeros(count, dtype=np.int64)
+        piece_stats = np.zeros((count, piece_count), dtype=np.int64)
+        over = np.zeros(count, dtype=bool)
+        line_scores = np.array([0, 100, 300, 500, 800], dtype=np.int64)
+
+        while True:
+            active = np.flatnonzero(~over & (pieces < max_pieces if max_pieces else True))
+            if active.size == 0:
+                break
+            placed, landing, valid = self._place_all(boards[active], current[active])
+            if self.policy == 'greedy':
+                scores = self._greedy_scores(placed)
+            else:
+                scores = rng.random(valid.shape)
+            scores = np.where(valid, scores, -np.inf)
+            choice = np.argmax(scores, axis=1)
+            rows = np.arange(active.size)
+
+            new_boards = placed[rows, choice]
+            drop = landing[rows, choice]
+            full = new_boards == FULL_ROW_MASK
+            cleared = full.sum(axis=1)
+            order = np.argsort(~full, axis=1, kind='stable')
+            new_boards = np.take_along_axis(np.where(full, 0, new_boards), order, axis=1)
+            boards[active] = new_boards
+
+            # Règles de TetrisGame.clear_lines et hard_drop
+            got_lines = cleared > 0
+            lvl = level[active]
+            combo_now = np.where(got_lines, combo[active] + 1,
+                                 np.where(last_cleared[active], 0, combo[active]))
+            is_perfect = got_lines & (new_boards == 0).all(axis=1)
+            gained = np.where(
+                got_lines,
+                line_scores[np.minimum(cleared, 4)] * lvl + 50 * combo_now * lvl
+                + np.where(is_perfect, 3000 * lvl, 0),
+                0,
+            )
+            score[active] += gained + 2 * np.maximum(drop, 0)
+            lines[active] += cleared
+            combo[active] = combo_now
+            max_combo[active] = np.maximum(max_combo[active], combo_now)
+            perfect[active] += is_perfect
+            last_cleared[active] = got_lines
+            level[active] = np.where(got_lines, np.minimum(10, 1 + lines[active] // 10), lvl)
+            np.add.at(piece_stats, (active, current[active]), 1)
+            pieces[active] += 1
+
+            # Pièce suivante ; partie perdue si elle ne peut pas apparaître
+            current[active] = upcoming[active]
+            upcoming[active] = draw(active.size)
+            spawn_offsets = self.offsets[current[active], self.spawn[current[active]]]
+            spawn_masks = self.masks[current[active], self.spawn[current[active]]]
+            spawn_rows = boards[active[:, None], spawn_offsets]
+            over[active] = ((spawn_rows & spawn_masks) != 0).any(axis=1)
+
+        return [
+            {
+                'seed': None,
+                'policy': self.policy,
+                'score': int(score[i]),
+                'lines_cleared': int(lines[i]),
+                'level': int(level[i]),
+                'pieces': int(pieces[i]),
+                'max_combo': int(max_combo[i]),
+                'perfect_clears': int(perfect[i]),
+                'game_over': bool(over[i]),
+                'piece_stats': {
+                    piece_type: int(piece_stats[i, piece_id])
+                    for piece_id, piece_type in enumerate(PIECE_TYPES)
+                },
+            }
+            for i in range(count)
+        ]
+
+    def run(self, games, seed=0, max_pieces=None):
+        """Simuler `games` parties par paquets de `batch_size` plateaux."""
+        rng = self.np.random.default_rng(seed)
+        results = []
+        remaining = games
+        while remaining > 0:
+            count = min(self.batch_size, remaining)
+            results.extend(self._run_chunk(count, rng, max_pieces))
+            remaining -= count
+        return results
+
+
+# Colonnes du fichier de résultats (une ligne par partie)
+RESULT_COLUMNS = (
+    ['seed', 'policy', 'score', 'lines_cleared', 'level', 'pieces',
+     'max_combo', 'perfect_clears', 'game_over']
+    + [f'piece_{piece_type}' for piece_type in PIECE_TYPES]
+)
+
+
+def result_row(result):
+    """Aplatir un résultat de partie selon RESULT_COLUMNS."""
+    row = {column: result[column] for column in RESULT_COLUMNS[:9]}
+    for piece_type in PIECE_TYPES:
+        row[f'piece_{piece_type}'] = result['piece_stats'].get(piece_type, 0)
+    return row
+
+
+def _simulate_task(task):
+    return simulate_game(*task)
+
+
+def run_parallel(seeds, policy='greedy', engine='bitboard', max_pieces=None,
+                 workers=None, chunksize=4, on_result=None):
+    """Répartir les parties sur un pool de processus.
+
+    `on_result` est appelé dans le processus parent pour chaque partie, dans
+    l'ordre où elles se terminent. Les résultats renvoyés sont triés par
+    graine : le même ensemble de graines donne toujours le même agrégat,
+    quel que soit le nombre de processus.
+    """
+    import multiprocessing
+
+    tasks = [(seed, policy, engine, max_pieces) for seed in seeds]
+    results = []
+    pool = multiprocessing.Pool(workers) if workers != 1 else None
+    try:
+        finished = (pool.imap_unordered(_simulate_task, tasks, chunksize) if pool
+                    else map(_simulate_task, tasks))
+        for result in finished:
+            results.append(result)
+            if on_result:
+                on_result(result)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    results.sort(key=lambda result: result['seed'])
+    return results
+
+
+def main(argv=None):
+    import argparse
+    import csv
+    import json
+    import os
+    import sys
+    import time
+
+    parser = argparse.ArgumentParser(
+        prog='python -m simulation',
+        description="Simuler des parties de Tetris avec des graines et agréger les résultats.",
+    )
+    parser.add_argument('-n', '--games', type=int, default=100, help="nombre de parties")
+    parser.add_argument('--seed', type=int, default=0, help="première graine (graines consécutives)")
+    parser.add_argument('--policy', choices=sorted(POLICIES), default='greedy')
+    parser.add_argument('--engine', default='bitboard', help="moteur de plateau (bitboard, grid)")
+    parser.add_argument('--max-pieces', type=int, default=None, help="arrêter une partie après N pièces")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(),
+                        help="nombre de processus (défaut : tous les cœurs)")
+    parser.add_argument('-o', '--output', help="fichier CSV des résultats, écrit au fil de l'eau")
+    parser.add_argument('--vectorized', action='store_true',
+                        help="mode NumPy (un seul processus, pièces tirées par NumPy)")
+    args = parser.parse_args(argv)
+
+    output = open(args.output, 'w', newline='') if args.output else None
+    writer = None
+    if output:
+        writer = csv.DictWriter(output, fieldnames=RESULT_COLUMNS)
+        writer.writeheader()
+
+    def on_result(result):
+        if writer:
+            writer.writerow(result_row(result))
+            output.flush()
+
+    started = time.perf_counter()
+    try:
+        if args.vectorized:
+            results = VectorizedSimulator(args.policy).run(args.games, args.seed, args.max_pieces)
+            for seed, result in enumerate(results, args.seed):
+                result['seed'] = seed
+                on_result(result)
+        else:
+            results = run_parallel(
+                range(args.seed, args.seed + args.games), args.policy, args.engine,
+                args.max_pieces, args.workers, on_result=on_result,
+            )
+    finally:
+        if output:
+            output.close()
+    elapsed = time.perf_counter() - started
+
+    summary = aggregate(results)
+    summary['elapsed'] = elapsed
+    summary['games_per_second'] = len(results) / elapsed if elapsed else None
+    json.dump(summary, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,151 @@
+"""
+Vérification des scores par rejeu des parties.
+Les fins de partie soumettent leur graine et leurs entrées à un pool de workers
+qui rejoue la partie et enregistre le verdict, hors du chemin de la requête."""
+
+import queue
+import threading
+import time
+
+from game_engine import TetrisGame
+
+PENDING = 'pending'
+VERIFIED = 'verified'
+REJECTED = 'rejected'
+LEGACY = 'legacy'  # score enregistré avant le rejeu : classé sans vérification
+
+
+def verify_replay(job):
+    """Rejouer la partie de `job` ; renvoie (statut, raison du rejet ou None)."""
+    if job.get('seed') is None or job.get('replay') is None:
+        return REJECTED, 'no_replay'
+    try:
+        game = TetrisGame.replay(job['seed'], job['replay'], job.get('game_mode', 'normal'))
+    except (ValueError, IndexError, KeyError):
+        return REJECTED, 'invalid_replay'
+    claimed = (job['score'], job['lines_cleared'], job['level_reached'])
+    if (game.score, game.lines_cleared, game.level) != claimed:
+        return REJECTED, 'score_mismatch'
+    return VERIFIED, None
+
+
+class ScoreVerifier:
+    """Pool de threads qui vérifie les scores soumis par `submit`.
+
+    La file est bornée : quand elle est pleine, `submit` refuse le travail
+    au lieu de bloquer la requête, et le score reste « pending » en base.
+    `load_pending(limit)` (facultatif) est appelé toutes les
+    `recover_interval` secondes pour reprendre ces scores, ainsi que ceux
+    laissés en attente par un worker arrêté. `record(job, statut, raison)`
+    enregistre chaque verdict.
+    """
+
+    def __init__(self, record, workers=2, max_queue=1000, verify=verify_replay,
+                 load_pending=None, recover_interval=30.0):
+        self.record = record
+        self.verify = verify
+        self.load_pending = load_pending
+        self.recover_interval = recover_interval
+        self.workers = workers
+        self._queue = queue.Queue(max_queue)
+        self._in_flight = set()  # identifiants soumis et pas encore enregistrés
+        self._lock = threading.Lock()
+        self._threads = []
+        self._stopping = threading.Event()
+        self._metrics = {
+            'submitted': 0,
+            'verified': 0,
+            'rejected': 0,
+            'refused': 0,
+            'recovered': 0,
+            'errors': 0,
+            'verify_time': 0.0,
+        }
+
+    def start(self):
+        if self._threads:
+            return
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'score-verifier-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        if self.load_pending:
+            thread = threading.Thread(target=self._recover, name='score-verifier-recovery', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, job):
+        """Mettre un score en file ; renvoie False si la file est pleine."""
+        with self._lock:
+            if job['id'] in self._in_flight:
+                return True
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self._metrics['refused'] += 1
+                return False
+            self._in_flight.add(job['id'])
+            self._metrics['submitted'] += 1
+        return True
+
+    def _work(self):
+        while not self._stopping.is_set():
+            try:
+                job = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                started = time.perf_counter()
+                status, reason = self.verify(job)
+                elapsed = time.perf_counter() - started
+                self.record(job, status, reason)
+                with self._lock:
+                    self._metrics[status] += 1
+                    self._metrics['verify_time'] += elapsed
+            except Exception:
+                # Le score reste « pending » : il sera repris par load_pending
+                with self._lock:
+                    self._metrics['errors'] += 1
+            finally:
+                with self._lock:
+                    self._in_flight.discard(job['id'])
+                self._queue.task_done()
+
+    def _recover(self):
+        while not self._stopping.wait(self.recover_interval):
+            room = self._queue.maxsize - self._queue.qsize() if self._queue.maxsize else 100
+            if room <= 0:
+                continue
+            try:
+                jobs = self.load_pending(room)
+            except Exception:
+                with self._lock:
+                    self._metrics['errors'] += 1
+                continue
+            for job in jobs:
+                if self.submit(job):
+                    with self._lock:
+                        self._metrics['recovered'] += 1
+
+    def join(self):
+        """Attendre que la file soit vide (tests, arrêt propre)."""
+        self._queue.join()
+
+    def stop(self, timeout=5.0):
+        """Arrêter les workers ; les scores non traités restent « pending »."""
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._metrics)
+            stats['queue_depth'] = self._queue.qsize()
+            stats['queue_capacity'] = self._queue.maxsize
+            stats['in_flight'] = len(self._in_flight)
+            stats['workers'] = self.workers
+        return stats